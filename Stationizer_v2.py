@@ -1,368 +1,458 @@
-import arcpy, os
-from shapely.geometry import shape, mapping
-import fiona
-from fiona.crs import from_epsg
-
-def prepare_point_data_and_run_near(point_fc, line_fc):
-    # Ensure the point feature class has a unique connection identifier field.
-    fields = [f.name for f in arcpy.ListFields(point_fc)]
-    if "ConnectionNum" not in fields:
-        arcpy.AddField_management(point_fc, "ConnectionNum", "SHORT")
-        # Populate ConnectionNum with the ObjectID value.
-        arcpy.CalculateField_management(point_fc, "ConnectionNum", "!OBJECTID!", "PYTHON3")
-        arcpy.AddMessage("Added and calculated 'ConnectionNum' field on the input points.")
-    # Run the Near tool to calculate the nearest location on the line.
-    arcpy.Near_analysis(point_fc, line_fc, search_radius="", location="LOCATION", angle="ANGLE")
-    arcpy.AddMessage("Executed Near analysis on the point feature class.")
-
-def select_points_within_50ft(point_fc):
-    # Create a feature layer from the point feature class with a SQL query to select points with NEAR_DIST <= 50.
-    where_clause = "NEAR_DIST <= 50"
-    selected_points_layer = "selected_points_layer"
-    arcpy.MakeFeatureLayer_management(point_fc, selected_points_layer, where_clause)
-    arcpy.AddMessage("Created a feature layer selecting points within 50 feet of the line.")
-    return selected_points_layer
-
-def export_selected_points(selected_points_layer, workspace, output_fc):
-    # Export the selected points to a new feature class.
-    arcpy.FeatureClassToFeatureClass_conversion(selected_points_layer, workspace, output_fc)
-    arcpy.AddMessage(f"Exported selected points to feature class: {output_fc}.")
-
-def create_xy_event_layer(input_fc):
-    # Create an XY Event Layer from the selected points using NEAR_X and NEAR_Y fields.
-    desc = arcpy.Describe(input_fc)
-    sr = desc.spatialReference
-    xy_event_layer = "Line_Points_Layer"
-    arcpy.MakeXYEventLayer_management(input_fc, "NEAR_X", "NEAR_Y", xy_event_layer, sr)
-    arcpy.AddMessage("Created XY Event Layer using NEAR_X and NEAR_Y from the selected points.")
-    return xy_event_layer
-
-def export_xy_event_layer(xy_event_layer, workspace, output_fc):
-    # Convert the XY Event Layer to a permanent feature class.
-    arcpy.FeatureClassToFeatureClass_conversion(xy_event_layer, workspace, output_fc)
-    arcpy.AddMessage(f"Exported XY Event Layer to feature class: {output_fc}.")
-
-def append_connection_points(conn_points_fc, target_fc):
-    # Append the projected (connection) points to the filtered copy of original points.
-    arcpy.Append_management(conn_points_fc, target_fc, "NO_TEST")
-    arcpy.AddMessage("Appended connection points to the selected points feature class.")
-
-def create_connection_lines(input_fc, output_fc):
-    # Create connection lines using the Points To Line tool by connecting points with the same ConnectionNum.
-    arcpy.PointsToLine_management(input_fc, output_fc, "ConnectionNum")
-    arcpy.AddMessage(f"Created connection lines: {output_fc}")
-
-def create_shapely_buffer(line_fc, buffer_fc_path):
-    """
-    Creates a flat 50ft buffer from line_fc using Shapely and writes it to a shapefile.
-    """
-    # Remove existing buffer shapefile if it exists.
-    if arcpy.Exists(buffer_fc_path) or os.path.exists(buffer_fc_path):
-        arcpy.Delete_management(buffer_fc_path)
-    
-    # Get the first geometry from the line feature class.
-    with arcpy.da.SearchCursor(line_fc, ["SHAPE@"]) as cursor:
-        for row in cursor:
-            line_geom = row[0]
-            break
-
-    # Convert to a Shapely geometry.
-    shapely_line = shape(line_geom.__geo_interface__)
-    # Create a 50ft flat buffer (cap_style=2 for flat).
-    shapely_buffer = shapely_line.buffer(50, cap_style=2)
-
-    # Get spatial reference factory code.
-    desc = arcpy.Describe(line_fc)
-    sr = desc.spatialReference
-    try:
-        epsg_code = sr.factoryCode
-    except Exception:
-        epsg_code = 4326  # Default to WGS84 if unavailable.
-    
-    crs = from_epsg(epsg_code)
-    schema = { "geometry": "Polygon", "properties": {"id": "int"} }
-    
-    # Write the shapely buffer to a shapefile.
-    with fiona.open(buffer_fc_path, "w", driver="ESRI Shapefile", crs=crs, schema=schema) as sink:
-        sink.write({
-            "geometry": mapping(shapely_buffer),
-            "properties": {"id": 1}
-        })
-    
-    arcpy.AddMessage(f"Created shapely buffer shapefile: {buffer_fc_path}")
-    return buffer_fc_path
-
-def delete_features_outside_buffer(line_fc, feature_classes, workspace):
-    """
-    1. Creates a flat 50ft buffer from line_fc using Shapely.
-    2. For each provided feature class, selects features that are not completely within the buffer,
-       including those along the edge.
-    3. Deletes those feature geometries.
-    """
-    # Define the output path for the shapely buffer shapefile.
-    # Adjust this path as needed.
-    buffer_fc_path = r"C:\Users\patri\Documents\PROJECTS\COTTONWOOD AREA 1\STO-C2-FDH47\SCRIPTS\EXPERIMENTS\Line_Buffer_50ft.shp"
-    buffer_fc = create_shapely_buffer(line_fc, buffer_fc_path)
-
-    # For each feature class, select features that are NOT completely within the buffer.
-    for fc in feature_classes:
-        layer_name = f"{fc}_layer"
-        arcpy.MakeFeatureLayer_management(fc, layer_name)
-        # Select features that are NOT completely within the buffer (including those touching its edge).
-        arcpy.SelectLayerByLocation_management(layer_name, "COMPLETELY_WITHIN", buffer_fc,
-                                                 selection_type="NEW_SELECTION",
-                                                 invert_spatial_relationship=True)
-        arcpy.AddMessage(f"Selected features in {fc} that are not completely within the buffer (including edge features).")
-        arcpy.DeleteFeatures_management(layer_name)
-        arcpy.AddMessage(f"Deleted features in {fc} that were outside or along the edge of the buffer.")
-
-    # Clean up the temporary buffer shapefile.
-    arcpy.Delete_management(buffer_fc)
-    arcpy.AddMessage("Cleaned up temporary buffer shapefile.")
-
-def format_station(distance_ft):
-    """
-    Convert a distance in feet (float) to a station string.
-    Examples:
-        91.521 ft  -> 00+92 (rounded)
-        124.836 ft -> 01+25 (rounded)
-    """
-    dist_rounded = int(round(distance_ft))
-    hundreds = dist_rounded // 100
-    remainder = dist_rounded % 100
-    # Format as XX+YY (leading zeros if needed)
-    return f"{hundreds:02d}+{remainder:02d}"
-
-def generate_segments(main_line_fc, snapped_points_fc, output_fc_name):
-    """Generate polylines from the start of a main polyline to each snapped point along it.
-       For each segment, calculate its length in feet, translate to station format,
-       and write that value to a new "STATIONING" text field.
-    """
-    arcpy.env.overwriteOutput = True  # Overwrite output if it exists
-
-    # Determine the geodatabase workspace and spatial reference from the main polyline feature class
-    workspace = os.path.dirname(arcpy.Describe(main_line_fc).catalogPath)  # path to the .gdb
-    spatial_ref = arcpy.Describe(main_line_fc).spatialReference
-
-    # Create the output feature class in the same geodatabase
-    output_fc_path = os.path.join(workspace, output_fc_name)
-    if arcpy.Exists(output_fc_path):
-        arcpy.management.Delete(output_fc_path)
-    arcpy.management.CreateFeatureclass(workspace, output_fc_name, "POLYLINE", 
-                                          spatial_reference=spatial_ref)
-
-    # Add a new text field "STATIONING" to the output feature class.
-    arcpy.AddField_management(output_fc_path, "STATIONING", "TEXT", field_length=20)
-    arcpy.AddField_management(output_fc_path, "SEGMENT_ID", "LONG")
-
-    # Read all polyline geometries into a dictionary (OID -> geometry) for quick access
-    polyline_geoms = {}
-    with arcpy.da.SearchCursor(main_line_fc, ["OID@", "SHAPE@"]) as line_cursor:
-        for oid, geom in line_cursor:
-            polyline_geoms[oid] = geom
-
-    # Prepare an insert cursor to add new polyline segments to the output feature class
-    # Now inserting both geometry and stationing string.
-    insert_fields = ["SHAPE@", "STATIONING"]
-    with arcpy.da.InsertCursor(output_fc_path, insert_fields) as insert_cursor:
-        # Iterate through each snapped point
-        with arcpy.da.SearchCursor(snapped_points_fc, ["SHAPE@"]) as point_cursor:
-            for (point_geom,) in point_cursor:
-                # Identify which polyline this point lies on; if only one, use it.
-                if len(polyline_geoms) == 1:
-                    line_geom = next(iter(polyline_geoms.values()))
-                else:
-                    line_geom = None
-                    for geom in polyline_geoms.values():
-                        if geom.distanceTo(point_geom) == 0:
-                            line_geom = geom
-                            break
-                    if line_geom is None:
-                        continue  # skip point if it’s not on any polyline
-
-                # Measure distance along the line from the start to the point’s position
-                dist_along = line_geom.measureOnLine(point_geom, use_percentage=False)  
-                # Create a polyline segment from the start (0) to this distance along the line
-                segment = line_geom.segmentAlongLine(0, dist_along, use_percentage=False)
-                # Calculate the station string using the segment's length
-                station_str = format_station(segment.length)
-                # Insert the new segment geometry along with its stationing value
-                insert_cursor.insertRow([segment, station_str])
-    arcpy.AddMessage(f"Generated segments feature class: {output_fc_path}")
-    
-    # Sorting the segments by their length (Shape_Length) and sequentially updating SEGMENT_ID.
-    rows = []
-    with arcpy.da.SearchCursor(output_fc_path, ["OID@", "SHAPE@"]) as s_cursor:
-        for row in s_cursor:
-            rows.append((row[0], row[1].length))
-    rows.sort(key=lambda x: x[1])
-    
-    sorted_ids = {}
-    segment_id = 1
-    for oid, _ in rows:
-        sorted_ids[oid] = segment_id
-        segment_id += 1
-    
-    with arcpy.da.UpdateCursor(output_fc_path, ["OID@", "SEGMENT_ID"]) as u_cursor:
-        for row in u_cursor:
-            row[1] = sorted_ids[row[0]]
-            u_cursor.updateRow(row)
-    
-    return output_fc_path
-
-def createEndPoints():
-
-    # Set environment settings
-    arcpy.env.overwriteOutput = True
-    workspace = r"C:\Users\patri\Documents\PROJECTS\COTTONWOOD AREA 1\STO-C2-FDH47\GDBs\DEVELOPMENT.gdb"
-    arcpy.env.workspace = workspace
-
-    # Input polyline feature class
-    polyline_fc = "RouteSegments"  
-
-    # Output feature class to store the last vertices as points
-    output_points = "EndPoints"
-
-    # Get spatial reference from input feature class
-    desc = arcpy.Describe(polyline_fc)
-    spatial_ref = desc.spatialReference
-
-    # Delete output if it exists
-    if arcpy.Exists(output_points):
-        arcpy.Delete_management(output_points)
-
-    # Create a new point feature class for storing last vertex points
-    arcpy.CreateFeatureclass_management(
-        out_path=workspace, 
-        out_name=output_points, 
-        geometry_type="POINT", 
-        spatial_reference=spatial_ref
-    )
-
-    # Add the two additional fields to the output feature class:
-    # SEGMENT_ID as an integer and STATIONING as a text field (length=50)
-    arcpy.AddField_management(output_points, "SEGMENT_ID", "LONG")
-    arcpy.AddField_management(output_points, "STATIONING", "TEXT", field_length=50)
-
-    # Use a SearchCursor on the input polyline fc to retrieve the geometry and the two fields,
-    # then an InsertCursor on the output fc to add the last vertex along with these values.
-    with arcpy.da.SearchCursor(polyline_fc, ["SHAPE@", "SEGMENT_ID", "STATIONING"]) as sCursor, \
-        arcpy.da.InsertCursor(output_points, ["SHAPE@", "SEGMENT_ID", "STATIONING"]) as iCursor:
-        for row in sCursor:
-            polyline = row[0]
-            seg_id = row[1]
-            stationing = row[2]
-            if polyline:
-                # Get the last vertex from the polyline
-                last_vertex = polyline.lastPoint
-                if last_vertex:
-                    # Create a point geometry from the last vertex using the same spatial reference
-                    last_pt_geom = arcpy.PointGeometry(last_vertex, spatial_ref)
-                    # Insert a new row into the output with the last vertex and field values
-                    iCursor.insertRow([last_pt_geom, seg_id, stationing])
-
-def selectionpaluza():
-    # Get the current ArcGIS project and the map by name.
-    aprx = arcpy.mp.ArcGISProject("CURRENT")
-    map_name = "DESIGN"
-    the_map = aprx.listMaps(map_name)[0]
-
-    # Retrieve the necessary layers from the map.
-    handholes = the_map.listLayers("Handholes")[0]
-    RouteSegments = the_map.listLayers("RouteSegments")[0]
-    Connection_Lines = the_map.listLayers("Connection_Lines")[0]
-
-    # Initialize a dictionary to store stationing values for each segment.
-    # The dictionary key is SEGMENT_ID and the value is the corresponding STATIONING string.
-    stationingDict = {}
-
-    # Populate the dictionary by iterating through RouteSegments.
-    # This ensures we map each segment's ID to its stationing value.
-    with arcpy.da.SearchCursor(RouteSegments, ["SEGMENT_ID", "STATIONING"]) as cursor:
-        for row in cursor:
-            stationingDict[row[0]] = row[1]
-
-    # Create the EndPoints feature class that stores the last vertices of RouteSegments.
-    createEndPoints()
-
-    # Retrieve the EndPoints layer from the map.
-    EndPoints = the_map.listLayers("EndPoints")[0]
-
-    # Loop through each segment (by SEGMENT_ID) to update the associated stationing values.
-    for id in stationingDict.keys():
-        # Build a selection query to isolate the endpoint corresponding to the current segment.
-        query = "SEGMENT_ID = " + str(id)
-        arcpy.SelectLayerByAttribute_management(EndPoints, "NEW_SELECTION", query)
-        
-        # Select connection lines that are within 1 foot of the selected endpoint.
-        arcpy.SelectLayerByLocation_management(Connection_Lines, "WITHIN_A_DISTANCE", EndPoints, "1 foot", "ADD_TO_SELECTION")
-        
-        # Further select handholes that are within 1 foot of the connection lines.
-        arcpy.SelectLayerByLocation_management(handholes, "WITHIN_A_DISTANCE", Connection_Lines, "1 foot", "ADD_TO_SELECTION")
-        
-        # Update the STATIONING field in the selected handholes to match the stationing for the current segment.
-        with arcpy.da.UpdateCursor(handholes, ["STATIONING"]) as line_cursor:
-            for row in line_cursor:
-                row[0] = stationingDict[id]
-                line_cursor.updateRow(row)
-        
-        # Clear selections on EndPoints, Connection_Lines, and handholes to prepare for the next iteration.
-        arcpy.SelectLayerByAttribute_management(EndPoints, "CLEAR_SELECTION")
-        arcpy.SelectLayerByAttribute_management(Connection_Lines, "CLEAR_SELECTION")
-        arcpy.SelectLayerByAttribute_management(handholes, "CLEAR_SELECTION")
-
-def clear_temp_feature_classes(workspace):
-    """
-    Deletes temporary feature classes: Append_Points, Connection_Lines, 
-    Line_Points, and RouteSegments from the given workspace.
-    """
-    temp_fcs = ["Append_Points", "Connection_Lines", "Line_Points", "RouteSegments","EndPoints"]
-    for fc in temp_fcs:
-        fc_path = os.path.join(workspace, fc)
-        if arcpy.Exists(fc_path):
-            arcpy.Delete_management(fc_path)
-            arcpy.AddMessage(f"Deleted temporary feature class: {fc_path}")
-        else:
-            arcpy.AddMessage(f"Temporary feature class not found: {fc_path}")
-
-def main():
-    # Set the workspace
-    workspace = r"C:\Users\patri\Documents\PROJECTS\COTTONWOOD AREA 1\STO-C2-FDH47\GDBs\DEVELOPMENT.gdb"
-    arcpy.env.workspace = workspace
-
-    # Define input and output feature classes.
-    point_fc = os.path.join(workspace, "Handholes")
-    line_fc = os.path.join(workspace, "CENTERLINE_TEST")
-    append_points = "Append_Points"        # Points within 50ft with connection IDs.
-    line_points = "Line_Points"            # Connection points on the line feature class.
-    connection_lines = "Connection_Lines"  # Final output of connection lines.
-    connection_lines_fc = os.path.join(workspace, "Connection_Lines")
-    map_name = "DESIGN"  # Name of the map containing the layers.
-
-    # Execute workflow steps.
-    prepare_point_data_and_run_near(point_fc, line_fc)
-    selected_points_layer = select_points_within_50ft(point_fc)
-    export_selected_points(selected_points_layer, workspace, append_points)
-    
-    xy_event_layer = create_xy_event_layer(append_points)
-    export_xy_event_layer(xy_event_layer, workspace, line_points)
-    
-    append_connection_points(line_points, append_points)
-    create_connection_lines(append_points, connection_lines)
-    
-    # Delete features outside the 50ft buffer (including those along its edge)
-    delete_features_outside_buffer(line_fc, [append_points, line_points, connection_lines], workspace)
-    
-    # Generate segments using the main line and the snapped points (Line_Points)
-    generate_segments(line_fc, line_points, "RouteSegments")
-
-    selectionpaluza()
-
-    # Delete temporary feature classes.
-    clear_temp_feature_classes(workspace)
-    
-    arcpy.AddMessage("Workflow complete. All feature classes updated with STATIONING values and temporary data deleted.")
-    print("Workflow complete. All feature classes updated with STATIONING values and temporary data deleted.")
-
-if __name__ == "__main__":
-    main()
+import argparse, os
+import numpy as np
+from backends import default_backend, get_backend
+from near_engine import WITHIN_50FT, near_analysis
+from connection_lines import build_connection_lines
+from corridor import build_corridor, delete_outside_corridor
+from centerline_index import build_centerline_index, match_points_to_centerlines
+from chainage import station_points, segment_geometry
+from centerline_cache import cached_chainage
+from route_segments import VirtualRouteSegments, end_point_table
+from geometry_arrays import iter_point_chunks
+from instrumentation import PipelineProfiler, count_features
+from parallel_stationing import station_handholes_parallel
+from incremental import record_fingerprints, restation_incremental
+from scratch import ScratchWorkspace
+from station_fields import STATION_FIELD, add_station_fields
+
+def prepare_point_data_and_run_near(point_fc, line_fc, backend=None, search_radius=50):
+    backend = backend or default_backend()
+    # Ensure the point feature class has a unique connection identifier field.
+    fields = backend.list_fields(point_fc)
+    if "ConnectionNum" not in fields:
+        backend.add_field(point_fc, "ConnectionNum", "SHORT")
+        # Populate ConnectionNum with the ObjectID value.
+        with backend.update_cursor(point_fc, ["OID@", "ConnectionNum"]) as cursor:
+            for row in cursor:
+                row[1] = row[0]
+                cursor.updateRow(row)
+        backend.message("Added and calculated 'ConnectionNum' field on the input points.")
+    # Calculate the nearest location on the line (same output fields as the Near tool, computed with NumPy).
+    # Only points within search_radius of a centerline are located; the rest are pruned up front and get -1.
+    near_analysis(point_fc, line_fc, backend, search_radius)
+    backend.message("Executed Near analysis on the point feature class.")
+
+def create_shapely_buffer(line_fc, distance=50, cache_dir=None, backend=None):
+    """
+    Creates a flat 50ft corridor around every line in line_fc using Shapely and returns it as an
+    in-memory polygon. With cache_dir, the polygon is reused across runs while the centerlines are unchanged.
+    """
+    backend = backend or default_backend()
+    # Read every centerline geometry, not just the first row.
+    with backend.search_cursor(line_fc, ["SHAPE@"]) as cursor:
+        line_geoms = [row[0] for row in cursor if row[0] is not None]
+
+    # Create a 50ft flat buffer (cap_style flat) around all lines, merged with a unary union.
+    shapely_buffer = build_corridor(line_geoms, distance, cap_style="flat", cache_dir=cache_dir)
+
+    backend.message(f"Created shapely buffer around {len(line_geoms)} centerline(s).")
+    return shapely_buffer
+
+def delete_features_outside_buffer(line_fc, feature_classes, workspace, backend=None, cache_dir=None):
+    """
+    1. Creates (or loads from cache) a flat 50ft buffer around the lines in line_fc using Shapely, kept in memory.
+    2. For each provided feature class, finds features that are not completely within the buffer,
+       including those along the edge, with one prepared-geometry test over all its geometries.
+    3. Deletes those features in a single cursor pass.
+    """
+    backend = backend or default_backend()
+    # The corridor polygon is cached next to the workspace (unless cache_dir is given), keyed by the
+    # centerline geometry hash.
+    cache_dir = cache_dir or os.path.join(os.path.dirname(workspace), "stationizer_cache")
+    shapely_buffer = create_shapely_buffer(line_fc, cache_dir=cache_dir, backend=backend)
+
+    # For each feature class, delete features that are NOT completely within the buffer.
+    for fc in feature_classes:
+        deleted = delete_outside_corridor(shapely_buffer, os.path.join(workspace, fc), backend)
+        backend.message(f"Deleted {deleted} features in {fc} that were outside or along the edge of the buffer.")
+
+def format_station(distance_ft):
+    """
+    Convert a distance in feet (float) to a station string.
+    Examples:
+        91.521 ft  -> 00+92 (rounded)
+        124.836 ft -> 01+25 (rounded)
+    """
+    dist_rounded = int(round(distance_ft))
+    hundreds = dist_rounded // 100
+    remainder = dist_rounded % 100
+    # Format as XX+YY (leading zeros if needed)
+    return f"{hundreds:02d}+{remainder:02d}"
+
+def load_centerlines(main_line_fc, backend=None, cache_dir=None):
+    """
+    Read every centerline in main_line_fc once.
+    Returns (polyline_geoms, chainages, line_index): OID -> geometry, OID -> chainage table (vertex and
+    cumulative-length arrays) and the STRtree centerline index used to match snapped points to a
+    centerline (None when there is only one). With cache_dir, the tables are loaded from (or saved to)
+    the on-disk cache.
+    """
+    backend = backend or default_backend()
+    spatial_ref = backend.spatial_reference(main_line_fc)
+    # Read all polyline geometries into a dictionary (OID -> geometry) for quick access
+    polyline_geoms = {}
+    with backend.search_cursor(main_line_fc, ["OID@", "SHAPE@"]) as line_cursor:
+        for oid, geom in line_cursor:
+            polyline_geoms[oid] = geom
+    # Precompute the vertex and cumulative-length arrays of every centerline once (or load them from the cache)
+    chainages = {oid: cached_chainage(geom, spatial_ref, cache_dir) for oid, geom in polyline_geoms.items()}
+    # Spatial index over the centerlines, built once here and shared by every chunk of snapped points.
+    line_index = build_centerline_index(polyline_geoms) if len(polyline_geoms) > 1 else None
+    return polyline_geoms, chainages, line_index
+
+def measure_snapped_points(line_index, chainages, points_xy):
+    """
+    Centerline OID and distance along it for every snapped point, as two arrays.
+    line_index comes from load_centerlines (None for a single centerline).
+    Points that are not on any centerline get line OID -1 and a NaN measure.
+    """
+    # Identify which polyline each point lies on (tolerance-based nearest lookup); if only one, use it.
+    if line_index is None:
+        line_oids = np.full(len(points_xy), next(iter(chainages)), dtype=np.int64)
+    else:
+        line_oids = match_points_to_centerlines(line_index, points_xy)
+    # Measure distance along the line from the start to each point’s position (NaN if off every line)
+    return line_oids, station_points(chainages, points_xy, line_oids)
+
+def station_measures(main_line_fc, snapped_points_fc, fields=(), backend=None, cache_dir=None):
+    """
+    Stationing-only mode: the measure of every snapped point, without building or writing any
+    RouteSegments geometry.
+    Returns a table as a dict of columns:
+        OID        - snapped point OID
+        LINE_OID   - centerline the point is on (-1 if none)
+        MEASURE    - distance along that centerline in feet (NaN if none)
+    plus one column per name in fields, read from the snapped points in the same cursor pass.
+    Station strings are not stored; format_station() turns a measure into one when it is written.
+    """
+    backend = backend or default_backend()
+    _, chainages, line_index = load_centerlines(main_line_fc, backend, cache_dir)
+    return measure_table(line_index, chainages, snapped_points_fc, fields, backend)
+
+def measure_table(line_index, chainages, snapped_points_fc, fields=(), backend=None):
+    # station_measures() on centerlines that are already loaded; the snapped points are streamed in chunks.
+    backend = backend or default_backend()
+    oids, line_oids, measures, extra = [], [], [], [[] for _ in fields]
+    for chunk_oids, chunk_xy, chunk_extra in iter_point_chunks(snapped_points_fc, fields, backend=backend):
+        chunk_line_oids, chunk_measures = measure_snapped_points(line_index, chainages, chunk_xy)
+        oids.append(chunk_oids)
+        line_oids.append(chunk_line_oids)
+        measures.append(chunk_measures)
+        for column, values in zip(extra, chunk_extra):
+            column.extend(values)
+    oids = np.concatenate(oids) if oids else np.empty(0, dtype=np.int64)
+    line_oids = np.concatenate(line_oids) if line_oids else np.empty(0, dtype=np.int64)
+    measures = np.concatenate(measures) if measures else np.empty(0)
+    table = {"OID": oids, "LINE_OID": line_oids, "MEASURE": measures}
+    table.update({name: column for name, column in zip(fields, extra)})
+    return table
+
+def generate_segments(main_line_fc, snapped_points_fc, output_fc_name, backend=None, cache_dir=None, virtual=False,
+                      output_workspace=None):
+    """Generate polylines from the start of a main polyline to each snapped point along it.
+       For each segment, calculate its length in feet, translate to station format,
+       and write that value to a new "STATIONING" text field.
+       SEGMENT_ID numbers the segments by increasing length; it is ranked from the measures before
+       the single insert pass, so the output is written once and never re-read.
+       With cache_dir, the centerline chainage tables are loaded from (or saved to) the on-disk cache.
+       With virtual, nothing is written: a VirtualRouteSegments (centerline + end measures) is returned
+       and can be passed to selectionpaluza as is, or exported to output_fc_name later.
+       output_fc_name is created in output_workspace (default: the main polyline's workspace).
+       Use station_measures() instead when only the stations are needed.
+    """
+    backend = backend or default_backend()
+
+    # Determine the workspace and spatial reference from the main polyline feature class
+    workspace = os.path.dirname(main_line_fc) or backend.workspace  # path to the .gdb/.gpkg
+    spatial_ref = backend.spatial_reference(main_line_fc)
+    # snapped_points_fc is a full path or a name in the main polyline's workspace.
+    if not os.path.dirname(snapped_points_fc):
+        snapped_points_fc = os.path.join(workspace, snapped_points_fc)
+
+    # Measure every snapped point first (streamed in chunks; only the measures are kept in memory).
+    # ConnectionNum, when the snapped points carry it, ties each segment to its handhole for selectionpaluza.
+    _, chainages, line_index = load_centerlines(main_line_fc, backend, cache_dir)
+    fields = [name for name in ["ConnectionNum"] if name in backend.list_fields(snapped_points_fc)]
+    table = measure_table(line_index, chainages, snapped_points_fc, fields, backend)
+    connection_nums = table.get("ConnectionNum")
+
+    if virtual:
+        route_segments = VirtualRouteSegments(chainages, table["LINE_OID"], table["MEASURE"], format_station,
+                                              spatial_ref, connection_nums)
+        backend.message(f"Generated {len(route_segments)} virtual route segments.")
+        return route_segments
+
+    # Create the output feature class in the same workspace, overwriting it if it exists
+    workspace = output_workspace or workspace
+    output_fc_path = os.path.join(workspace, output_fc_name)
+    if backend.exists(output_fc_path):
+        backend.delete(output_fc_path)
+    backend.create_feature_class(workspace, output_fc_name, "POLYLINE", spatial_ref)
+
+    # Add the "STATIONING" text field and the indexed numeric STATION_FT to the output feature class.
+    add_station_fields(output_fc_path, backend)
+    backend.add_field(output_fc_path, "SEGMENT_ID", "LONG")
+    if connection_nums is not None:
+        backend.add_field(output_fc_path, "ConnectionNum", "LONG")
+
+    on_line = np.flatnonzero(table["LINE_OID"] != -1)  # skip points that are not on any polyline
+    # A segment's length is its end measure, so ranking the measures is ranking by Shape_Length.
+    # The stable sort keeps ties in Line_Points order, like the old sort of the written rows.
+    segment_ids = np.empty(len(on_line), dtype=np.int64)
+    segment_ids[np.argsort(table["MEASURE"][on_line], kind="stable")] = np.arange(1, len(on_line) + 1)
+
+    # Insert the segments once, in Line_Points order (as VirtualRouteSegments orders them), with
+    # SEGMENT_ID, the stations and ConnectionNum already filled in, so the output is never re-read or updated.
+    insert_fields = ["SHAPE@", "STATIONING", STATION_FIELD, "SEGMENT_ID"]
+    if connection_nums is not None:
+        insert_fields.append("ConnectionNum")
+    with backend.insert_cursor(output_fc_path, insert_fields) as insert_cursor:
+        for i, segment_id in zip(on_line.tolist(), segment_ids.tolist()):
+            # Create a polyline segment from the start (0) to this distance along the line
+            measure = float(table["MEASURE"][i])
+            segment = segment_geometry(chainages[int(table["LINE_OID"][i])], measure)
+            row = [segment, format_station(measure), measure, segment_id]
+            if connection_nums is not None:
+                row.append(connection_nums[i])
+            insert_cursor.insertRow(row)
+    backend.message(f"Generated segments feature class: {output_fc_path}")
+    
+    return output_fc_path
+
+def createEndPoints(workspace, polyline_fc="RouteSegments", output_points="EndPoints", backend=None):
+    """
+    Write the last vertex of every RouteSegments polyline (or VirtualRouteSegments) to a point
+    feature class with SEGMENT_ID, STATIONING and STATION_FT, in a single insert pass. Returns its path.
+    The workflow itself no longer needs this: selectionpaluza uses end_point_table() in memory.
+    """
+    backend = backend or default_backend()
+
+    # Input polyline feature class (or VirtualRouteSegments) and output feature class to store the last vertices as points
+    if isinstance(polyline_fc, VirtualRouteSegments):
+        spatial_ref = polyline_fc.spatial_ref
+    else:
+        # A RouteSegments name is looked up in workspace; a full path is used as is.
+        if not os.path.dirname(polyline_fc):
+            polyline_fc = os.path.join(workspace, polyline_fc)
+        # Get spatial reference from input feature class
+        spatial_ref = backend.spatial_reference(polyline_fc)
+    end_points = end_point_table(polyline_fc, backend)
+    output_fc = os.path.join(workspace, output_points)
+
+    # Delete output if it exists
+    if backend.exists(output_fc):
+        backend.delete(output_fc)
+
+    # Create a new point feature class for storing last vertex points
+    backend.create_feature_class(workspace, output_points, "POINT", spatial_ref)
+
+    # Add the additional fields to the output feature class:
+    # SEGMENT_ID as an integer, STATIONING as a text field (length=50) and the indexed STATION_FT
+    backend.add_field(output_fc, "SEGMENT_ID", "LONG")
+    add_station_fields(output_fc, backend, text_length=50)
+
+    # The STATIONING text is formatted from STATION_FT as each row is written.
+    with backend.insert_cursor(output_fc, ["SHAPE@XY", "SEGMENT_ID", "STATIONING", STATION_FIELD]) as iCursor:
+        for xy, seg_id, station_ft in zip(end_points["XY"].tolist(), end_points["SEGMENT_ID"].tolist(),
+                                          end_points[STATION_FIELD].tolist()):
+            iCursor.insertRow([tuple(xy), seg_id, format_station(station_ft), station_ft])
+    return output_fc
+
+def selectionpaluza(point_fc, route_segments_fc, connection_lines_fc, backend=None):
+    """
+    Station every handhole from the end of its own route segment: the segment, the connection line
+    and the handhole are tied together by ConnectionNum, and a handhole whose connection line was
+    clipped off the corridor is not stationed. This is the same rule as the stations-only, parallel
+    and incremental modes (see stationing_by_connection), so every mode writes the same stations.
+    """
+    backend = backend or default_backend()
+    # route_segments_fc is a RouteSegments feature class or the VirtualRouteSegments from generate_segments.
+
+    # The end of every segment with its station and ConnectionNum, held in memory.
+    # For virtual segments they come straight from the station measures, so no EndPoints
+    # feature class is written and no RouteSegments geometry is read back.
+    end_points = end_point_table(route_segments_fc, backend)
+    if "ConnectionNum" not in end_points:
+        raise ValueError("RouteSegments have no ConnectionNum; generate them from Line_Points built by "
+                         "build_connection_lines.")
+    stations = {"ConnectionNum": end_points["ConnectionNum"], "MEASURE": end_points[STATION_FIELD]}
+    update_point_stationing(point_fc, stationing_by_connection(point_fc, stations, connection_lines_fc, backend),
+                            backend)
+
+def stationing_by_connection(point_fc, stations, connection_lines_fc=None, backend=None):
+    """
+    Map a station_measures() table of Line_Points back to handhole OIDs through ConnectionNum,
+    the identifier both carry. With connection_lines_fc, only handholes whose connection line is
+    still there (i.e. was not clipped off the corridor) are stationed; only its ConnectionNum
+    column is read. Returns a dict of handhole OID -> station in feet.
+    """
+    backend = backend or default_backend()
+    by_connection = {num: measure for num, measure in zip(stations["ConnectionNum"], stations["MEASURE"].tolist())
+                     if not np.isnan(measure)}
+    if connection_lines_fc:
+        with backend.search_cursor(connection_lines_fc, ["ConnectionNum"]) as cursor:
+            connected = {connection_num for (connection_num,) in cursor}
+        by_connection = {num: measure for num, measure in by_connection.items() if num in connected}
+    handhole_stations = {}
+    with backend.search_cursor(point_fc, ["OID@", "ConnectionNum"]) as cursor:
+        for oid, connection_num in cursor:
+            if connection_num in by_connection:
+                handhole_stations[oid] = by_connection[connection_num]
+    return handhole_stations
+
+def update_point_stationing(point_fc, handhole_stations, backend=None):
+    # Write STATION_FT and its STATIONING text to the matched handholes (OID -> feet) in a single cursor pass.
+    backend = backend or default_backend()
+    add_station_fields(point_fc, backend)
+    with backend.update_cursor(point_fc, ["OID@", "STATIONING", STATION_FIELD]) as line_cursor:
+        for row in line_cursor:
+            if row[0] in handhole_stations:
+                row[1] = format_station(handhole_stations[row[0]])
+                row[2] = handhole_stations[row[0]]
+                line_cursor.updateRow(row)
+    backend.message(f"Updated STATIONING on {len(handhole_stations)} handholes.")
+
+def clear_temp_feature_classes(workspace, backend=None):
+    """
+    Deletes temporary feature classes: Append_Points, Connection_Lines, Line_Points, RouteSegments,
+    EndPoints and the spatial join outputs from the given workspace. main() keeps its intermediates
+    in a ScratchWorkspace; this clears what older runs left in the production workspace.
+    """
+    backend = backend or default_backend()
+    temp_fcs = ["Append_Points", "Connection_Lines", "Line_Points", "RouteSegments", "EndPoints",
+                "conn_lines_join", "handholes_conn_lines_join"]
+    for fc in temp_fcs:
+        fc_path = os.path.join(workspace, fc)
+        if backend.exists(fc_path):
+            backend.delete(fc_path)
+            backend.message(f"Deleted temporary feature class: {fc_path}")
+        else:
+            backend.message(f"Temporary feature class not found: {fc_path}")
+
+# Default workspace for the STO-C2-FDH47 development run.
+WORKSPACE = r"C:\Users\patri\Documents\PROJECTS\COTTONWOOD AREA 1\STO-C2-FDH47\GDBs\DEVELOPMENT.gdb"
+
+def main(workspace=WORKSPACE, backend=None, profile_report=None, workers=None, point_layer="Handholes",
+         line_layer="CENTERLINE_TEST", incremental=False, stations_only=False):
+    """
+    Run the stationing workflow on workspace, stationing point_layer along line_layer.
+    With workers, handholes are partitioned by nearest centerline and each partition is stationed
+    in a separate process (see parallel_stationing.py); this skips the intermediate feature classes.
+    With incremental, only handholes added or moved since the last run are re-stationed (see
+    incremental.py); the first run, or any run after the centerline changed, is a full run.
+    With stations_only, the snapped points are measured along the centerline and the stations are
+    written straight to the handholes through ConnectionNum; no RouteSegments or EndPoints are built.
+    Every mode stations a handhole from its own snapped point, so they all write the same stations.
+    With profile_report (a .json path), every stage is timed (wall and CPU), its peak memory and
+    feature counts in/out are recorded, the report is written there and a one-line summary is shown.
+    """
+    # Set the workspace and pick the storage backend (arcpy for a .gdb, GeoPackage/OGR for a .gpkg)
+    backend = backend or get_backend(workspace=workspace)
+    profiler = PipelineProfiler(enabled=bool(profile_report))
+
+    # Define input and output feature classes.
+    point_fc = os.path.join(workspace, point_layer)
+    line_fc = os.path.join(workspace, line_layer)
+    # Corridor cache and handhole/centerline fingerprints live next to the workspace.
+    cache_dir = os.path.join(os.path.dirname(workspace), "stationizer_cache")
+    fingerprints = os.path.join(cache_dir, f"{os.path.basename(workspace)}.{point_layer}.fingerprints.json")
+
+    if incremental:
+        with profiler.stage("incremental", count_in=lambda: count_features(backend, point_fc)):
+            changes = restation_incremental(point_fc, line_fc, format_station, fingerprints, cache_dir=cache_dir,
+                                            backend=backend)
+        if changes is not None:
+            finish_run(backend, profiler, profile_report, workspace)
+            return
+
+    if workers:
+        # Parallel mode: Near, clip and stationing per route in a process pool, one write pass at the end.
+        with profiler.stage("parallel_stationing", count_in=lambda: count_features(backend, point_fc),
+                            count_out=lambda: count_features(backend, point_fc, "STATIONING IS NOT NULL")):
+            station_handholes_parallel(point_fc, line_fc, format_station, max_workers=workers, cache_dir=cache_dir,
+                                       backend=backend)
+        if incremental:
+            record_fingerprints(point_fc, line_fc, fingerprints, backend=backend)
+        finish_run(backend, profiler, profile_report, workspace)
+        return
+
+    # Intermediate feature classes go to a scratch workspace ("memory" for arcpy, a temp GeoPackage
+    # otherwise) and are deleted when the block exits, even if a stage fails.
+    with ScratchWorkspace(backend) as scratch:
+        run_stages(point_fc, line_fc, scratch, profiler, backend, cache_dir, stations_only)
+
+    backend.message("Workflow complete. All feature classes updated with STATIONING values and temporary data deleted.")
+    print("Workflow complete. All feature classes updated with STATIONING values and temporary data deleted.")
+    if incremental:
+        record_fingerprints(point_fc, line_fc, fingerprints, backend=backend)
+    finish_run(backend, profiler, profile_report, workspace)
+
+def run_stages(point_fc, line_fc, scratch, profiler, backend, cache_dir, stations_only=False):
+    # The serial workflow, with every intermediate feature class in the scratch workspace.
+    line_points = "Line_Points"            # Connection points on the line feature class.
+    connection_lines = "Connection_Lines"  # Final output of connection lines.
+    line_points_fc = scratch.path(line_points)
+    connection_lines_fc = scratch.path(connection_lines)
+    clipped_fcs = lambda: count_features(backend, line_points_fc) + count_features(backend, connection_lines_fc)
+
+    with profiler.stage("near", count_in=lambda: count_features(backend, point_fc),
+                        count_out=lambda: count_features(backend, point_fc, WITHIN_50FT)):
+        prepare_point_data_and_run_near(point_fc, line_fc, backend)
+
+    # Build the connection lines and their snapped Line_Points for points within 50ft in one pass.
+    with profiler.stage("connection_lines", count_in=lambda: count_features(backend, point_fc, WITHIN_50FT),
+                        count_out=lambda: count_features(backend, connection_lines_fc)):
+        build_connection_lines(point_fc, scratch.workspace, connection_lines, where_clause=WITHIN_50FT,
+                               line_points_fc=line_points, backend=backend)
+    
+    # Delete features outside the 50ft buffer (including those along its edge)
+    with profiler.stage("buffer_clip", count_in=clipped_fcs, count_out=clipped_fcs):
+        delete_features_outside_buffer(line_fc, [line_points, connection_lines], scratch.workspace, backend,
+                                       cache_dir)
+    
+    if stations_only:
+        # Measure the snapped points (Line_Points) directly and hand each station to its handhole.
+        with profiler.stage("station_measures", count_in=lambda: count_features(backend, line_points_fc),
+                            count_out=lambda: count_features(backend, point_fc, "STATIONING IS NOT NULL")):
+            stations = station_measures(line_fc, line_points_fc, ["ConnectionNum"], backend, cache_dir)
+            handhole_stations = stationing_by_connection(point_fc, stations, connection_lines_fc, backend)
+            update_point_stationing(point_fc, handhole_stations, backend)
+    else:
+        # Generate segments using the main line and the snapped points (Line_Points)
+        # RouteSegments stay virtual (one centerline + end measures); no polylines are written.
+        with profiler.stage("generate_segments", count_in=lambda: count_features(backend, line_points_fc),
+                            count_out=lambda: len(route_segments)):
+            route_segments = generate_segments(line_fc, line_points_fc, "RouteSegments", backend, cache_dir,
+                                               virtual=True)
+
+        with profiler.stage("selectionpaluza", count_in=lambda: len(route_segments),
+                            count_out=lambda: count_features(backend, point_fc, "STATIONING IS NOT NULL")):
+            selectionpaluza(point_fc, route_segments, connection_lines_fc, backend=backend)
+
+    # Delete the intermediate feature classes.
+    with profiler.stage("cleanup"):
+        scratch.cleanup()
+
+def finish_run(backend, profiler, profile_report, workspace):
+    # Write the run report and its one-line summary when profiling is on.
+    if profile_report:
+        profiler.close()
+        profiler.write_report(profile_report, workspace=workspace, backend=backend.name)
+        backend.message(profiler.summary())
+        backend.message(f"Run report: {profile_report}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Station handholes along CENTERLINE_TEST.")
+    parser.add_argument("workspace", nargs="?", default=WORKSPACE, help="File geodatabase or GeoPackage to process.")
+    parser.add_argument("--points", default="Handholes", help="Point feature class to station.")
+    parser.add_argument("--centerline", default="CENTERLINE_TEST", help="Centerline feature class.")
+    parser.add_argument("--backend", choices=["arcpy", "ogr"], help="Storage backend (default: from the workspace type).")
+    parser.add_argument("--profile", metavar="REPORT_JSON", help="Time every stage and write a JSON run report here.")
+    parser.add_argument("--workers", type=int, help="Station each centerline's handholes in parallel with this many processes.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only re-station handholes added or moved since the last --incremental run.")
+    parser.add_argument("--stations-only", action="store_true",
+                        help="Write stations from the measures directly, without building RouteSegments.")
+    args = parser.parse_args()
+    main(args.workspace, get_backend(args.backend, args.workspace), args.profile, args.workers,
+         args.points, args.centerline, args.incremental, args.stations_only)
\ No newline at end of file
@@ -0,0 +1,402 @@
+import os
+import sqlite3
+
+import shapely
+from shapely.geometry import mapping, shape, MultiLineString
+
+try:
+    import arcpy
+except ImportError:  # Headless runs use the GeoPackage backend.
+    arcpy = None
+
+try:
+    import fiona
+except ImportError:  # Only the GeoPackage backend needs fiona.
+    fiona = None
+
+# Cursor field tokens understood by both backends, as in arcpy.da.
+OID_TOKEN = "OID@"
+SHAPE_TOKEN = "SHAPE@"
+XY_TOKEN = "SHAPE@XY"
+
+def _shape_xy(geom):
+    # SHAPE@XY: the point itself, or the centroid for other geometry types (as in arcpy).
+    if geom is None or geom.is_empty:
+        return None
+    point = geom if geom.geom_type == "Point" else geom.centroid
+    return (point.x, point.y)
+
+class ArcpyBackend:
+    """
+    Storage backend on top of arcpy and file geodatabases.
+    Cursors work like arcpy.da cursors, except that SHAPE@ reads and writes Shapely
+    geometries so the pipeline code is the same for every backend.
+    """
+    name = "arcpy"
+
+    def __init__(self, workspace=None):
+        if arcpy is None:
+            raise RuntimeError("The arcpy backend needs ArcGIS Pro's arcpy.")
+        self.workspace = workspace
+        if workspace:
+            arcpy.env.workspace = workspace
+
+    def message(self, text):
+        arcpy.AddMessage(text)
+
+    def exists(self, fc):
+        return arcpy.Exists(fc)
+
+    def delete(self, fc):
+        arcpy.Delete_management(fc)
+
+    def list_fields(self, fc):
+        return [f.name for f in arcpy.ListFields(fc)]
+
+    def add_field(self, fc, name, field_type, field_length=None):
+        arcpy.AddField_management(fc, name, field_type, field_length=field_length)
+
+    def add_index(self, fc, fields, index_name):
+        # Attribute index on fields; does nothing when fc already has an index of that name.
+        if index_name not in [index.name for index in arcpy.ListIndexes(fc)]:
+            arcpy.AddIndex_management(fc, fields, index_name)
+
+    def spatial_reference(self, fc):
+        return arcpy.Describe(fc).spatialReference
+
+    def create_feature_class(self, workspace, name, geometry_type, spatial_reference):
+        arcpy.CreateFeatureclass_management(workspace, name, geometry_type, spatial_reference=spatial_reference)
+        return os.path.join(workspace, name)
+
+    def search_cursor(self, fc, fields, where_clause=None):
+        return _ArcpyCursor(arcpy.da.SearchCursor(fc, fields, where_clause), fields, None)
+
+    def insert_cursor(self, fc, fields):
+        return _ArcpyCursor(arcpy.da.InsertCursor(fc, fields), fields, self.spatial_reference(fc))
+
+    def update_cursor(self, fc, fields, where_clause=None):
+        return _ArcpyCursor(arcpy.da.UpdateCursor(fc, fields, where_clause), fields, self.spatial_reference(fc))
+
+class _ArcpyCursor:
+    # Wraps an arcpy.da cursor, converting SHAPE@ values between arcpy and Shapely geometries.
+
+    def __init__(self, cursor, fields, spatial_ref):
+        self._cursor = cursor
+        self._spatial_ref = spatial_ref
+        self._shape_idx = [i for i, f in enumerate(fields) if f.upper() == SHAPE_TOKEN]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.__exit__(*exc)
+        return False
+
+    def __iter__(self):
+        for row in self._cursor:
+            if self._shape_idx:
+                row = list(row)
+                for i in self._shape_idx:
+                    row[i] = None if row[i] is None else shapely.from_wkb(bytes(row[i].WKB))
+            yield row
+
+    def _to_arcpy(self, row):
+        row = list(row)
+        for i in self._shape_idx:
+            if row[i] is not None:
+                row[i] = arcpy.FromWKB(bytearray(shapely.to_wkb(row[i])), self._spatial_ref)
+        return row
+
+    def insertRow(self, row):
+        return self._cursor.insertRow(self._to_arcpy(row))
+
+    def updateRow(self, row):
+        self._cursor.updateRow(self._to_arcpy(row))
+
+    def deleteRow(self):
+        self._cursor.deleteRow()
+
+# arcpy field types -> GeoPackage column types (as GDAL writes them).
+GPKG_FIELD_TYPES = {"TEXT": "TEXT", "SHORT": "SMALLINT", "LONG": "MEDIUMINT", "DOUBLE": "DOUBLE",
+                    "FLOAT": "FLOAT", "DATE": "DATETIME"}
+# arcpy geometry types -> fiona schema geometry types.
+GPKG_GEOMETRY_TYPES = {"POINT": "Point", "POLYLINE": "MultiLineString", "POLYGON": "MultiPolygon"}
+
+class OgrBackend:
+    """
+    Storage backend on a GeoPackage through fiona/OGR, so the pipeline runs without arcpy.
+    Feature classes are addressed as "<workspace>.gpkg/<layer>" (or a bare layer name inside
+    the backend's workspace), mirroring "<workspace>.gdb/<feature class>".
+    Reading, creating and inserting go through fiona. Attribute updates, deletes and new
+    fields are applied with SQLite directly, since OGR drivers cannot update in place via fiona.
+    """
+    name = "ogr"
+
+    def __init__(self, workspace):
+        if fiona is None:
+            raise RuntimeError("The GeoPackage backend needs fiona.")
+        self.workspace = workspace
+
+    def message(self, text):
+        print(text)
+
+    def _split(self, fc):
+        # Resolve a feature class path into (GeoPackage path, layer name).
+        parent, layer = os.path.split(fc)
+        if parent.lower().endswith(".gpkg"):
+            return parent, layer
+        return self.workspace, fc
+
+    def exists(self, fc):
+        gpkg, layer = self._split(fc)
+        return os.path.exists(gpkg) and layer in fiona.listlayers(gpkg)
+
+    def delete(self, fc):
+        gpkg, layer = self._split(fc)
+        fiona.remove(gpkg, layer=layer)
+
+    def list_fields(self, fc):
+        gpkg, layer = self._split(fc)
+        with fiona.open(gpkg, layer=layer) as collection:
+            return list(collection.schema["properties"])
+
+    def add_field(self, fc, name, field_type, field_length=None):
+        column_type = GPKG_FIELD_TYPES[field_type.upper()]
+        if column_type == "TEXT" and field_length:
+            column_type = f"TEXT({int(field_length)})"
+        with _gpkg_connection(*self._split(fc)) as (con, table, _):
+            con.execute(f'ALTER TABLE "{table}" ADD COLUMN "{name}" {column_type}')
+
+    def add_index(self, fc, fields, index_name):
+        # SQLite index names are unique per GeoPackage, so the layer name is prefixed.
+        columns = ", ".join(f'"{field}"' for field in fields)
+        with _gpkg_connection(*self._split(fc)) as (con, table, _):
+            con.execute(f'CREATE INDEX IF NOT EXISTS "{table}_{index_name}" ON "{table}" ({columns})')
+
+    def spatial_reference(self, fc):
+        gpkg, layer = self._split(fc)
+        with fiona.open(gpkg, layer=layer) as collection:
+            return collection.crs
+
+    def create_feature_class(self, workspace, name, geometry_type, spatial_reference):
+        schema = {"geometry": GPKG_GEOMETRY_TYPES[geometry_type.upper()], "properties": {}}
+        with fiona.open(workspace, "w", driver="GPKG", layer=name, schema=schema, crs=spatial_reference):
+            pass
+        return os.path.join(workspace, name)
+
+    def search_cursor(self, fc, fields, where_clause=None):
+        return _OgrSearchCursor(*self._split(fc), fields, where_clause)
+
+    def insert_cursor(self, fc, fields):
+        return _OgrInsertCursor(*self._split(fc), fields)
+
+    def update_cursor(self, fc, fields, where_clause=None):
+        return _OgrUpdateCursor(*self._split(fc), fields, where_clause)
+
+def _gpkg_blob_geometry(blob):
+    # Parse a GeoPackage geometry blob (GP header + optional envelope + WKB) into Shapely.
+    envelope_size = {0: 0, 1: 32, 2: 48, 3: 48, 4: 64}[(blob[3] >> 1) & 0x07]
+    return shapely.from_wkb(bytes(blob[8 + envelope_size:]))
+
+def _blob_bound(i):
+    def bound(blob):
+        return None if blob is None else float(shapely.bounds(_gpkg_blob_geometry(blob))[i])
+    return bound
+
+def _blob_is_empty(blob):
+    if blob is None:
+        return None
+    return int(bool((blob[3] >> 4) & 1) or _gpkg_blob_geometry(blob).is_empty)
+
+class _gpkg_connection:
+    """
+    SQLite connection to a GeoPackage layer, committed on success.
+    Registers the ST_* functions the GeoPackage R-tree triggers call, which GDAL normally provides.
+    Yields (connection, table name, fid column).
+    """
+
+    def __init__(self, gpkg, layer):
+        self.gpkg, self.layer = gpkg, layer
+
+    def __enter__(self):
+        self.con = sqlite3.connect(self.gpkg)
+        for i, name in enumerate(["ST_MinX", "ST_MinY", "ST_MaxX", "ST_MaxY"]):
+            self.con.create_function(name, 1, _blob_bound(i), deterministic=True)
+        self.con.create_function("ST_IsEmpty", 1, _blob_is_empty, deterministic=True)
+        fid_column = next(row[1] for row in self.con.execute(f'PRAGMA table_info("{self.layer}")') if row[5])
+        return self.con, self.layer, fid_column
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.con.commit()
+        self.con.close()
+        return False
+
+def _ogr_value(feature, field):
+    token = field.upper()
+    if token == OID_TOKEN:
+        return int(feature.id)
+    if token in (SHAPE_TOKEN, XY_TOKEN):
+        geom = None if feature.geometry is None else shape(feature.geometry)
+        return geom if token == SHAPE_TOKEN else _shape_xy(geom)
+    return feature.properties[field]
+
+# Rows buffered by a GeoPackage insert cursor before they are written out, and rows read per page.
+OGR_FLUSH_ROWS = 20000
+
+class _OgrSearchCursor:
+    """
+    Reads the layer in pages of OGR_FLUSH_ROWS features (by ascending FID) and closes the dataset
+    between pages, so an insert cursor on the same GeoPackage can flush while this cursor is being
+    iterated (an open SQLite read handle would block the writer).
+    Each page's FID range is taken from SQLite with ORDER BY fid first and the features are then
+    fetched for that range: a where clause served from an attribute index returns rows in index
+    order, so paging on the FID of the last row read would skip and repeat rows.
+    """
+
+    def __init__(self, gpkg, layer, fields, where_clause):
+        self._gpkg, self._layer = gpkg, layer
+        self._fields = fields
+        self._where = where_clause
+        # Open once up front so a missing layer fails here, as arcpy does when the cursor is created.
+        fiona.open(gpkg, layer=layer).close()
+        con = sqlite3.connect(gpkg)
+        try:
+            self._fid_column = next(row[1] for row in con.execute(f'PRAGMA table_info("{layer}")') if row[5])
+        finally:
+            con.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def _page_end(self, last_fid):
+        # Highest FID among the next OGR_FLUSH_ROWS matching rows after last_fid (None when there are none).
+        fid = f'"{self._fid_column}"'
+        where = f"{fid} > {last_fid}" + (f" AND ({self._where})" if self._where else "")
+        with _gpkg_connection(self._gpkg, self._layer) as (con, table, _):
+            return con.execute(f'SELECT MAX({fid}) FROM (SELECT {fid} FROM "{table}" WHERE {where} '
+                               f'ORDER BY {fid} LIMIT {OGR_FLUSH_ROWS})').fetchone()[0]
+
+    def __iter__(self):
+        last_fid = -1
+        while True:
+            page_end = self._page_end(last_fid)
+            if page_end is None:
+                return
+            where = f'"{self._fid_column}" > {last_fid} AND "{self._fid_column}" <= {page_end}'
+            if self._where:
+                where = f"({self._where}) AND {where}"
+            with fiona.open(self._gpkg, layer=self._layer) as collection:
+                page = sorted(collection.filter(where=where), key=lambda feature: int(feature.id))
+            for feature in page:
+                yield tuple(_ogr_value(feature, field) for field in self._fields)
+            last_fid = page_end
+
+class _OgrInsertCursor:
+    # Buffers rows and appends them with fiona writerecords, every OGR_FLUSH_ROWS rows and when the cursor closes.
+
+    def __init__(self, gpkg, layer, fields):
+        self._gpkg, self._layer, self._fields = gpkg, layer, fields
+        self._records = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.flush()
+        return False
+
+    def insertRow(self, row):
+        geom, properties = None, {}
+        for field, value in zip(self._fields, row):
+            token = field.upper()
+            if token == SHAPE_TOKEN:
+                geom = value
+            elif token == XY_TOKEN:
+                geom = shapely.Point(value)
+            elif token != OID_TOKEN:
+                properties[field] = value
+        self._records.append((geom, properties))
+        if len(self._records) >= OGR_FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        if not self._records:
+            return
+        with fiona.open(self._gpkg, "a", layer=self._layer) as collection:
+            multi_lines = collection.schema["geometry"] == "MultiLineString"
+            # fiona expects every schema field on each record; fields not inserted are left null.
+            field_names = list(collection.schema["properties"])
+            records = []
+            for geom, properties in self._records:
+                if multi_lines and geom is not None and geom.geom_type == "LineString":
+                    geom = MultiLineString([geom])
+                records.append({"geometry": None if geom is None else mapping(geom),
+                                "properties": {name: properties.get(name) for name in field_names}})
+            collection.writerecords(records)
+        self._records = []
+
+class _OgrUpdateCursor:
+    """
+    Reads through fiona; updateRow/deleteRow are collected and applied in one SQLite
+    transaction when the cursor closes. Geometry values can be read but not changed.
+    """
+
+    def __init__(self, gpkg, layer, fields, where_clause):
+        self._gpkg, self._layer, self._fields = gpkg, layer, fields
+        self._search = _OgrSearchCursor(gpkg, layer, [OID_TOKEN] + list(fields), where_clause)
+        self._attr_idx = [i for i, f in enumerate(fields) if f.upper() not in (OID_TOKEN, SHAPE_TOKEN, XY_TOKEN)]
+        self._current = None
+        self._updates, self._deletes = [], []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self._search.__exit__(exc_type, *exc)
+        if exc_type is None:
+            self._apply()
+        return False
+
+    def __iter__(self):
+        for row in self._search:
+            self._current = row[0]
+            yield list(row[1:])
+
+    def updateRow(self, row):
+        self._updates.append((self._current, [row[i] for i in self._attr_idx]))
+
+    def deleteRow(self):
+        self._deletes.append((self._current,))
+
+    def _apply(self):
+        if not self._updates and not self._deletes:
+            return
+        with _gpkg_connection(self._gpkg, self._layer) as (con, table, fid_column):
+            if self._updates and self._attr_idx:
+                columns = ", ".join(f'"{self._fields[i]}" = ?' for i in self._attr_idx)
+                con.executemany(f'UPDATE "{table}" SET {columns} WHERE "{fid_column}" = ?',
+                                [values + [fid] for fid, values in self._updates])
+            if self._deletes:
+                con.executemany(f'DELETE FROM "{table}" WHERE "{fid_column}" = ?', self._deletes)
+
+def get_backend(name=None, workspace=None):
+    """
+    Backend factory: "arcpy" or "ogr". Without a name, a .gpkg workspace selects the
+    GeoPackage backend and anything else (e.g. a .gdb) selects arcpy.
+    """
+    if name is None:
+        name = "ogr" if workspace and workspace.lower().endswith(".gpkg") else "arcpy"
+    if name == "arcpy":
+        return ArcpyBackend(workspace)
+    if name in ("ogr", "gpkg"):
+        return OgrBackend(workspace)
+    raise ValueError(f"Unknown backend: {name}")
+
+def default_backend():
+    # Backend used by helpers called without one: arcpy against arcpy.env.workspace.
+    return ArcpyBackend(arcpy.env.workspace if arcpy is not None else None)
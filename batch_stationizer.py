@@ -0,0 +1,126 @@
+import argparse, csv, hashlib, json, os, sys, time, traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import Stationizer_v2 as stationizer
+from backends import get_backend
+from scratch import atomic_write
+
+def load_manifest(path):
+    """
+    Read the list of jobs to run. The manifest is either
+        - a JSON list of objects, or
+        - a CSV file with a header row
+    with a "workspace" column and optional "points", "centerline" and "backend" columns, e.g.
+        workspace,points,centerline
+        C:\\...\\STO-C2-FDH47\\GDBs\\DEVELOPMENT.gdb,Handholes,CENTERLINE_TEST
+    Relative workspaces are resolved against the manifest's folder.
+    """
+    with open(path, newline="") as f:
+        rows = json.load(f) if path.lower().endswith(".json") else list(csv.DictReader(f))
+    base = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    for row in rows:
+        if not row.get("workspace"):
+            raise ValueError(f"Manifest row without a workspace: {row}")
+        jobs.append({
+            "workspace": os.path.join(base, row["workspace"]),
+            "points": row.get("points") or "Handholes",
+            "centerline": row.get("centerline") or "CENTERLINE_TEST",
+            "backend": row.get("backend") or None,
+        })
+    return jobs
+
+def job_key(job):
+    # Identifies a job in the state file, so a re-run can tell which ones already completed.
+    return "|".join([os.path.normcase(os.path.abspath(job["workspace"])), job["points"], job["centerline"]])
+
+def load_state(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+def save_state(path, state):
+    with atomic_write(path) as f:
+        json.dump(state, f, indent=2)
+
+def run_job(job, profile_dir=None):
+    """
+    Run the Stationizer_v2 workflow for one job (in a worker process).
+    Failures are caught and returned, so one bad workspace does not stop the batch.
+    """
+    start = time.perf_counter()
+    result = {"workspace": job["workspace"], "points": job["points"], "centerline": job["centerline"]}
+    try:
+        profile_report = None
+        if profile_dir:
+            name = os.path.splitext(os.path.basename(job["workspace"]))[0]
+            profile_report = os.path.join(profile_dir, f"{name}_{hashlib.sha1(job_key(job).encode()).hexdigest()[:8]}.json")
+        stationizer.main(job["workspace"], get_backend(job["backend"], job["workspace"]), profile_report,
+                         point_layer=job["points"], line_layer=job["centerline"])
+        result["status"] = "ok"
+    except Exception as e:
+        result["status"] = "failed"
+        result["error"] = f"{type(e).__name__}: {e}"
+        result["traceback"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+def run_batch(jobs, state_path, max_workers=2, force=False, profile_dir=None):
+    """
+    Run every job on a pool of at most max_workers processes.
+    Jobs recorded as completed in the state file are skipped unless force is set; the state file
+    is updated as each job finishes, so re-running after a crash only picks up what is left.
+    Returns the list of job results (skipped jobs included, with status "skipped").
+    """
+    state = {} if force else load_state(state_path)
+    results, pending = [], []
+    for job in jobs:
+        if state.get(job_key(job), {}).get("status") == "ok":
+            results.append({**state[job_key(job)], "status": "skipped"})
+        else:
+            pending.append(job)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(run_job, job, profile_dir): job for job in pending}
+        for future in as_completed(futures):
+            job = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:  # The worker process itself died (e.g. a crash inside arcpy).
+                result = {"workspace": job["workspace"], "points": job["points"], "centerline": job["centerline"],
+                          "status": "failed", "error": f"{type(e).__name__}: {e}", "seconds": None}
+            state[job_key(job)] = {k: v for k, v in result.items() if k != "traceback"}
+            save_state(state_path, state)
+            results.append(result)
+            seconds = "" if result["seconds"] is None else f" in {result['seconds']:.1f}s"
+            print(f"[{result['status']}] {job['workspace']}{seconds}" +
+                  (f": {result['error']}" if result["status"] == "failed" else ""))
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Station many FDH workspaces listed in a manifest.")
+    parser.add_argument("manifest", help="JSON or CSV manifest of workspaces (and optional layer names).")
+    parser.add_argument("--jobs", type=int, default=2, help="Number of workspaces processed at once.")
+    parser.add_argument("--state", help="Completed-jobs file (default: <manifest>.state.json).")
+    parser.add_argument("--force", action="store_true", help="Re-run jobs that already completed.")
+    parser.add_argument("--report", help="Write the per-job results as JSON here.")
+    parser.add_argument("--profile-dir", help="Write a per-stage run report for every job into this folder.")
+    args = parser.parse_args()
+
+    jobs = load_manifest(args.manifest)
+    state_path = args.state or f"{os.path.splitext(args.manifest)[0]}.state.json"
+    start = time.perf_counter()
+    results = run_batch(jobs, state_path, args.jobs, args.force, args.profile_dir)
+
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("ok", "skipped", "failed")}
+    print(f"Batch finished in {time.perf_counter() - start:.1f}s: {counts['ok']} ok, "
+          f"{counts['skipped']} skipped, {counts['failed']} failed.")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"manifest": os.path.abspath(args.manifest), "counts": counts, "jobs": results}, f, indent=2)
+    # Non-zero exit status when any job failed, so schedulers and build scripts notice.
+    return 1 if counts["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
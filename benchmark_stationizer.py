@@ -0,0 +1,237 @@
+import argparse, json, os, platform, shutil, subprocess, tempfile, time
+import numpy as np
+import shapely
+from shapely.geometry import LineString, MultiLineString
+
+import Stationizer_v2 as stationizer
+from backends import get_backend
+from instrumentation import count_features
+from near_engine import WITHIN_50FT
+from parallel_stationing import station_handholes_parallel
+from station_fields import STATION_FIELD
+
+# Synthetic data is written in a projected CRS with US-foot units, like the production GDBs.
+EPSG = 2230
+ROUTE_LENGTH_FT = 20000.0
+SHAPES = ["straight", "curvy", "multipart"]
+
+def synthetic_centerline(kind, length=ROUTE_LENGTH_FT, vertices=400):
+    """
+    Centerline of roughly `length` feet:
+        straight  - a single 2-vertex line
+        curvy     - a sine wave with `vertices` vertices
+        multipart - two curvy parts with a gap between them
+    """
+    if kind == "straight":
+        return LineString([(0.0, 0.0), (length, 0.0)])
+    x = np.linspace(0.0, length, vertices)
+    y = 400.0 * np.sin(x / 900.0) + 120.0 * np.sin(x / 130.0)
+    if kind == "curvy":
+        return LineString(np.column_stack([x, y]))
+    if kind == "multipart":
+        half = vertices // 2
+        return MultiLineString([np.column_stack([x[:half], y[:half]]),
+                                np.column_stack([x[half + 1:], y[half + 1:] + 300.0])])
+    raise ValueError(f"Unknown centerline shape: {kind}")
+
+def synthetic_handholes(line, count, offset_sd=25.0, far_fraction=0.2, seed=0):
+    """
+    Handhole cloud around `line`: most points sit at a random station with a normal offset,
+    far_fraction of them are scattered over the whole extent (the county-wide layer case).
+    Returns an (count, 2) array of coordinates.
+    """
+    rng = np.random.default_rng(seed)
+    n_far = int(count * far_fraction)
+    n_near = count - n_far
+    stations = rng.random(n_near) * line.length
+    on_line = shapely.get_coordinates(shapely.line_interpolate_point(line, stations))
+    near = on_line + rng.normal(0.0, offset_sd, size=(n_near, 2))
+    minx, miny, maxx, maxy = line.bounds
+    far = np.column_stack([rng.uniform(minx - 5000, maxx + 5000, n_far),
+                           rng.uniform(miny - 5000, maxy + 5000, n_far)])
+    return np.vstack([near, far])
+
+def create_workspace(backend_name, folder):
+    # Empty workspace for one synthetic dataset: a GeoPackage, or a file geodatabase for arcpy.
+    if backend_name == "arcpy":
+        import arcpy
+        arcpy.CreateFileGDB_management(folder, "bench.gdb")
+        return os.path.join(folder, "bench.gdb"), arcpy.SpatialReference(EPSG)
+    return os.path.join(folder, "bench.gpkg"), f"EPSG:{EPSG}"
+
+def write_synthetic_dataset(backend, workspace, spatial_ref, line, handholes_xy):
+    # Write CENTERLINE_TEST and Handholes (with an empty STATIONING field) through the backend.
+    line_fc = backend.create_feature_class(workspace, "CENTERLINE_TEST", "POLYLINE", spatial_ref)
+    with backend.insert_cursor(line_fc, ["SHAPE@"]) as cursor:
+        cursor.insertRow([line])
+    point_fc = backend.create_feature_class(workspace, "Handholes", "POINT", spatial_ref)
+    backend.add_field(point_fc, "STATIONING", "TEXT", field_length=20)
+    with backend.insert_cursor(point_fc, ["SHAPE@XY"]) as cursor:
+        for xy in handholes_xy.tolist():
+            cursor.insertRow([tuple(xy)])
+    return point_fc, line_fc
+
+# RouteSegments paths timed on every run: kept in memory as main() does, and written out.
+SEGMENT_PATHS = ["virtual", "materialized"]
+# Paths that run after the shared stages: the RouteSegments paths and stations-only mode.
+SERIAL_PATHS = SEGMENT_PATHS + ["stations_only"]
+# Every path that stations the handholes; the parallel mode (main(workers=...)) runs its own Near and clip.
+PATHS = SERIAL_PATHS + ["parallel"]
+
+def run_pipeline(backend, workspace, point_fc, line_fc, workers=2):
+    """
+    Run the Stationizer_v2 workflow stage by stage and time each one.
+    The old 50 ft select and export steps are part of connection_lines since the
+    one-pass builder replaced them.
+    generate_segments and stationing_transfer run once per SEGMENT_PATHS entry on the same
+    Line_Points, then stations-only mode on them, then the parallel mode stations the same
+    handholes with `workers` processes.
+    The handhole stations are cleared before each path; the stations each path writes must be
+    identical, otherwise a RuntimeError is raised.
+    Returns the list of {"stage", "path", "seconds", "features_out"} dicts (path is None for the
+    shared stages) and the {OID: (STATIONING, STATION_FT)} stations of the handholes.
+    """
+    line_points_fc = os.path.join(workspace, "Line_Points")
+    connection_lines_fc = os.path.join(workspace, "Connection_Lines")
+    results = []
+
+    def timed(name, path, stage, features_out):
+        start = time.perf_counter()
+        output = stage()
+        seconds = time.perf_counter() - start
+        results.append({"stage": name, "path": path, "seconds": seconds, "features_out": features_out(output)})
+        return output
+
+    timed("near", None, lambda: stationizer.prepare_point_data_and_run_near(point_fc, line_fc, backend),
+          lambda _: count_features(backend, point_fc))
+    timed("connection_lines", None, lambda: stationizer.build_connection_lines(
+        point_fc, workspace, "Connection_Lines", where_clause=WITHIN_50FT,
+        line_points_fc="Line_Points", backend=backend), lambda _: count_features(backend, connection_lines_fc))
+    timed("buffer_clip", None, lambda: stationizer.delete_features_outside_buffer(
+        line_fc, ["Line_Points", "Connection_Lines"], workspace, backend),
+          lambda _: count_features(backend, connection_lines_fc))
+
+    stations = {}
+    for path in SEGMENT_PATHS:
+        clear_stations(backend, point_fc)
+        route_segments = timed("generate_segments", path, lambda: stationizer.generate_segments(
+            line_fc, line_points_fc, "RouteSegments", backend, virtual=path == "virtual"),
+            lambda output: len(output) if path == "virtual" else count_features(backend, output))
+        timed("stationing_transfer", path, lambda: stationizer.selectionpaluza(
+            point_fc, route_segments, connection_lines_fc, backend=backend),
+              lambda _: count_features(backend, point_fc))
+        stations[path] = read_stations(backend, point_fc)
+
+    clear_stations(backend, point_fc)
+    timed("station_measures", "stations_only", lambda: stationizer.update_point_stationing(
+        point_fc, stationizer.stationing_by_connection(
+            point_fc, stationizer.station_measures(line_fc, line_points_fc, ["ConnectionNum"], backend),
+            connection_lines_fc, backend), backend), lambda _: count_features(backend, point_fc))
+    stations["stations_only"] = read_stations(backend, point_fc)
+
+    clear_stations(backend, point_fc)
+    timed("parallel_stationing", "parallel", lambda: station_handholes_parallel(
+        point_fc, line_fc, stationizer.format_station, max_workers=workers, backend=backend), len)
+    stations["parallel"] = read_stations(backend, point_fc)
+
+    # Every path must station every handhole the same way.
+    reference = stations[PATHS[0]]
+    for path in PATHS[1:]:
+        differing = set(reference.items()) ^ set(stations[path].items())
+        if differing:
+            raise RuntimeError(f"{len({oid for oid, _ in differing})} handholes are stationed differently by the "
+                               f"{PATHS[0]} and {path} paths.")
+    return results, reference
+
+def clear_stations(backend, point_fc):
+    # Empty STATIONING and STATION_FT on every handhole (the fields only exist after the first stationing).
+    if STATION_FIELD not in backend.list_fields(point_fc):
+        return
+    with backend.update_cursor(point_fc, ["STATIONING", STATION_FIELD]) as cursor:
+        for row in cursor:
+            cursor.updateRow([None, None])
+
+def read_stations(backend, point_fc):
+    """
+    Stations written to the handholes, as {OID: (STATIONING, STATION_FT)}.
+    They are read once with a full scan and once through a where clause on the indexed
+    STATION_FT field; a cursor that skips or repeats rows once the index exists fails the run.
+    """
+    fields = ["OID@", "STATIONING", STATION_FIELD]
+    with backend.search_cursor(point_fc, fields) as cursor:
+        scanned = {oid: (stationing, station_ft) for oid, stationing, station_ft in cursor if station_ft is not None}
+    with backend.search_cursor(point_fc, fields, f"{STATION_FIELD} >= 0") as cursor:
+        rows = [(oid, (stationing, station_ft)) for oid, stationing, station_ft in cursor]
+    indexed = dict(rows)
+    if len(rows) != len(indexed) or indexed != scanned:
+        raise RuntimeError(f"Indexed where clause on {STATION_FIELD} returned {len(rows)} rows "
+                           f"({len(indexed)} unique), the full scan {len(scanned)} stationed handholes.")
+    return scanned
+
+def run_scenario(shape, count, backend_name, seed=0, workers=2):
+    # Generate one synthetic dataset in a scratch folder, run the pipeline on it and clean up.
+    folder = tempfile.mkdtemp(prefix="stationizer_bench_")
+    try:
+        workspace, spatial_ref = create_workspace(backend_name, folder)
+        backend = get_backend(backend_name, workspace)
+        line = synthetic_centerline(shape)
+        start = time.perf_counter()
+        point_fc, line_fc = write_synthetic_dataset(backend, workspace, spatial_ref, line,
+                                                    synthetic_handholes(line, count, seed=seed))
+        setup_seconds = time.perf_counter() - start
+        stages, stations = run_pipeline(backend, workspace, point_fc, line_fc, workers)
+        return {
+            "shape": shape,
+            "handholes": count,
+            "setup_seconds": setup_seconds,
+            "stages": stages,
+            "stationed": len(stations),
+            # The stages of one path, plus the shared stages for the serial paths.
+            "total_seconds": {path: sum(stage["seconds"] for stage in stages
+                                        if stage["path"] == path or (stage["path"] is None and path in SERIAL_PATHS))
+                              for path in PATHS},
+        }
+    finally:
+        shutil.rmtree(folder, ignore_errors=True)
+
+def git_revision():
+    # Commit of the code being benchmarked, so reports from different versions can be compared.
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Stationizer_v2 workflow on synthetic data.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="Handhole counts to run (10^3 to 10^6).")
+    parser.add_argument("--shapes", nargs="+", choices=SHAPES, default=SHAPES, help="Centerline shapes to run.")
+    parser.add_argument("--backend", choices=["ogr", "arcpy"], default="ogr", help="Storage backend.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=2, help="Worker processes for the parallel path.")
+    parser.add_argument("--output", default="stationizer_benchmark.json", help="JSON report path.")
+    args = parser.parse_args()
+
+    report = {
+        "revision": git_revision(),
+        "backend": args.backend,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "runs": [],
+    }
+    for shape in args.shapes:
+        for count in args.sizes:
+            run = run_scenario(shape, count, args.backend, args.seed, args.workers)
+            report["runs"].append(run)
+            totals = ", ".join(f"{path} {seconds:.2f}s" for path, seconds in run["total_seconds"].items())
+            summary = ", ".join(f"{s['stage']}{'' if s['path'] is None else ' (' + s['path'] + ')'} {s['seconds']:.2f}s"
+                                for s in run["stages"])
+            print(f"{shape:9s} {count:>8d} handholes: total {totals} ({summary})")
+
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Wrote benchmark report: {args.output}")
+
+if __name__ == "__main__":
+    main()
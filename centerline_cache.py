@@ -0,0 +1,139 @@
+import glob, hashlib, os, zipfile
+
+import numpy as np
+import shapely
+
+from chainage import build_chainage, chainage_from_arrays
+from scratch import atomic_write
+
+# Bump when the stored layout or build_chainage() changes; entries in an older format are rebuilt.
+CACHE_FORMAT = 1
+# Upper bound on the total size of a cache folder before the least recently used entries are evicted.
+MAX_CACHE_BYTES = 512 * 2 ** 20
+# Files in the cache folder that take part in LRU eviction (chainage tables and corridor polygons).
+CACHE_PATTERNS = ["chainage_*.npz", "corridor_*.wkb"]
+
+CHAINAGE_ARRAYS = ["vertices", "measures", "part_offsets", "seg_index"]
+
+def spatial_reference_text(spatial_ref):
+    # Stable text form of an arcpy SpatialReference or a fiona CRS.
+    if spatial_ref is None:
+        return ""
+    if hasattr(spatial_ref, "exportToString"):
+        return spatial_ref.exportToString()
+    return str(spatial_ref)
+
+def line_wkb(line_geom):
+    # WKB of a Shapely or arcpy polyline.
+    if isinstance(line_geom, shapely.Geometry):
+        return shapely.to_wkb(line_geom)
+    return bytes(line_geom.WKB)
+
+def chainage_cache_key(line_geom, spatial_ref=None):
+    # Hash of the centerline's WKB and spatial reference; any edit to the line gives a new key.
+    key = hashlib.sha256(line_wkb(line_geom))
+    key.update(f"|{spatial_reference_text(spatial_ref)}|{CACHE_FORMAT}".encode())
+    return key.hexdigest()
+
+def _checksum(arrays):
+    digest = hashlib.sha256()
+    for name in CHAINAGE_ARRAYS:
+        digest.update(np.ascontiguousarray(arrays[name]).tobytes())
+    return digest.hexdigest()
+
+def _valid_chainage(entry, key):
+    """
+    Validation of a loaded entry: right format and key, consistent array shapes, non-decreasing
+    measures and a matching checksum. Anything else (an older format, a truncated or hand-edited
+    file, a hash collision on the file name) counts as stale.
+    """
+    if int(entry["format"]) != CACHE_FORMAT or str(entry["key"]) != key:
+        return False
+    vertices, measures = entry["vertices"], entry["measures"]
+    part_offsets, seg_index = entry["part_offsets"], entry["seg_index"]
+    if vertices.ndim != 2 or vertices.shape[1] != 2 or len(measures) != len(vertices):
+        return False
+    if len(part_offsets) < 2 or part_offsets[-1] != len(vertices):
+        return False
+    if len(seg_index) and (seg_index.min() < 0 or seg_index.max() >= len(vertices) - 1):
+        return False
+    if np.any(np.diff(measures) < 0):
+        return False
+    return str(entry["checksum"]) == _checksum(entry)
+
+def _load_chainage(path, key):
+    try:
+        with np.load(path, allow_pickle=False) as data:
+            entry = {name: data[name] for name in data.files}
+        if _valid_chainage(entry, key):
+            return entry
+    except (OSError, ValueError, KeyError, zipfile.BadZipFile):
+        pass
+    # Stale or corrupt entry: drop it so it is rebuilt below.
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+    return None
+
+def _store_chainage(path, key, chainage):
+    arrays = {name: chainage[name] for name in CHAINAGE_ARRAYS}
+    with atomic_write(path, "wb") as f:
+        np.savez(f, format=CACHE_FORMAT, key=key, checksum=_checksum(arrays), **arrays)
+
+def cached_chainage(line_geom, spatial_ref=None, cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """
+    build_chainage() with an on-disk cache keyed by chainage_cache_key().
+    A hit loads the vertex/measure arrays from cache_dir/chainage_<key>.npz and only rebuilds the
+    segment STRtree; a miss builds the table and stores it. Without cache_dir this is build_chainage().
+    """
+    if not cache_dir:
+        return build_chainage(line_geom)
+    key = chainage_cache_key(line_geom, spatial_ref)
+    path = os.path.join(cache_dir, f"chainage_{key}.npz")
+    if os.path.exists(path):
+        entry = _load_chainage(path, key)
+        if entry is not None:
+            touch(path)
+            return chainage_from_arrays(*(entry[name] for name in CHAINAGE_ARRAYS))
+
+    chainage = build_chainage(line_geom)
+    os.makedirs(cache_dir, exist_ok=True)
+    _store_chainage(path, key, chainage)
+    evict_cache(cache_dir, max_bytes, keep=path)
+    return chainage
+
+def touch(path):
+    # Mark a cache entry as recently used (the modification time is the LRU clock).
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+
+def evict_cache(cache_dir, max_bytes=MAX_CACHE_BYTES, keep=None):
+    """
+    Delete the least recently used cache entries until the folder is under max_bytes.
+    keep (the entry just written) is never evicted. Returns the number of deleted files.
+    """
+    entries = []
+    for pattern in CACHE_PATTERNS:
+        for path in glob.glob(os.path.join(cache_dir, pattern)):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Removed by another process meanwhile.
+            entries.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in entries)
+    deleted = 0
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if keep and os.path.abspath(path) == os.path.abspath(keep):
+            continue
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        total -= size
+        deleted += 1
+    return deleted
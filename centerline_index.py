@@ -0,0 +1,33 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import shape
+
+# Distance (in the centerline's linear units) within which a snapped point counts as lying on a line.
+# Replaces the exact `distanceTo(point) == 0` test, which fails on floating point round-off.
+SNAP_TOLERANCE = 0.01
+
+def build_centerline_index(polyline_geoms):
+    """
+    Build an STRtree over the centerline geometries once.
+    polyline_geoms is a dict of OID -> polyline (arcpy or Shapely).
+    Returns (tree, oids) where oids[i] is the OID of the i-th geometry in the tree.
+    """
+    oids = np.fromiter(polyline_geoms.keys(), dtype=np.int64, count=len(polyline_geoms))
+    lines = [shape(geom.__geo_interface__) for geom in polyline_geoms.values()]
+    return STRtree(lines), oids
+
+def match_points_to_centerlines(index, points_xy, tolerance=SNAP_TOLERANCE):
+    """
+    For every point return the OID of the closest centerline within tolerance, or -1 if none.
+    All points are resolved in one bulk nearest query against the tree.
+    """
+    tree, oids = index
+    points_xy = np.asarray(points_xy, dtype=np.float64).reshape(-1, 2)
+    matched = np.full(len(points_xy), -1, dtype=np.int64)
+    if len(points_xy) == 0 or len(oids) == 0:
+        return matched
+    point_idx, tree_idx = tree.query_nearest(shapely.points(points_xy), max_distance=tolerance,
+                                             all_matches=False)
+    matched[point_idx] = oids[tree_idx]
+    return matched
@@ -0,0 +1,149 @@
+import numpy as np
+import shapely
+from shapely import STRtree
+from shapely.geometry import LineString, MultiLineString
+
+from geometry_arrays import polyline_parts
+
+try:
+    import arcpy
+except ImportError:  # Only segment_polyline() needs arcpy; segment_geometry() is its Shapely twin.
+    arcpy = None
+
+def build_chainage(line_geom):
+    """
+    Precompute the cumulative-chainage table for one centerline.
+    All parts are concatenated into a single vertex array. measures[i] is the distance along the
+    line at vertex i; the jump between two parts adds no length, matching measureOnLine.
+
+    Returns a dict with:
+        vertices     - (V, 2) vertex coordinates
+        measures     - (V,) cumulative length at each vertex (non-decreasing)
+        part_offsets - vertex index where each part starts, plus V at the end
+        seg_index    - index i of every real segment (vertex i -> i+1, never across a part break)
+        tree         - STRtree over those segments for nearest-segment lookup
+        length       - total length of the line
+    """
+    parts = polyline_parts(line_geom)
+    if not parts:
+        raise ValueError("Centerline has no parts with at least two vertices.")
+    vertices = np.concatenate(parts)
+    part_offsets = np.cumsum([0] + [len(part) for part in parts])
+
+    step = np.hypot(*np.diff(vertices, axis=0).T)
+    # Segments that join the last vertex of one part to the first vertex of the next are not on the line.
+    is_real = np.ones(len(step), dtype=bool)
+    is_real[part_offsets[1:-1] - 1] = False
+    step[~is_real] = 0.0
+    measures = np.concatenate([[0.0], np.cumsum(step)])
+    return chainage_from_arrays(vertices, measures, part_offsets, np.flatnonzero(is_real))
+
+def chainage_from_arrays(vertices, measures, part_offsets, seg_index):
+    """
+    Rebuild a build_chainage() table from its arrays (e.g. loaded from centerline_cache).
+    Only the segment STRtree is recomputed, which is a vectorized bulk load.
+    """
+    seg_lines = shapely.linestrings(np.stack([vertices[seg_index], vertices[seg_index + 1]], axis=1))
+    return {
+        "vertices": vertices,
+        "measures": measures,
+        "part_offsets": part_offsets,
+        "seg_index": seg_index,
+        "tree": STRtree(seg_lines),
+        "length": float(measures[-1]),
+    }
+
+def measure_points(chainage, points_xy):
+    """
+    Distance along the centerline (from its start) of each point's closest location on it.
+    The nearest segment comes from the STRtree; the measure is then a vectorized projection onto
+    that segment added to the cumulative length at its first vertex. When a point is equally close
+    to several segments (e.g. at a vertex) the one earliest along the line wins.
+    """
+    points_xy = np.asarray(points_xy, dtype=np.float64).reshape(-1, 2)
+    if len(points_xy) == 0:
+        return np.empty(0)
+    point_idx, tree_idx = chainage["tree"].query_nearest(shapely.points(points_xy), all_matches=True)
+    nearest = np.full(len(points_xy), np.iinfo(np.int64).max, dtype=np.int64)
+    np.minimum.at(nearest, point_idx, chainage["seg_index"][tree_idx])
+
+    vertices, measures = chainage["vertices"], chainage["measures"]
+    start, end = vertices[nearest], vertices[nearest + 1]
+    direction = end - start
+    seg_len2 = np.einsum("ij,ij->i", direction, direction)
+    t = np.einsum("ij,ij->i", points_xy - start, direction)
+    t = np.clip(np.divide(t, seg_len2, out=np.zeros_like(t), where=seg_len2 > 0), 0.0, 1.0)
+    return measures[nearest] + t * (measures[nearest + 1] - measures[nearest])
+
+def station_points(chainages, points_xy, line_oids):
+    """
+    Batch stationing entry point shared by Stationizer_v1/v2 and curvy_line_generator.
+    chainages maps centerline OID -> build_chainage() table; line_oids gives the centerline of
+    each point (-1 = not on any line). Returns one measure per point, NaN where line_oids is -1.
+    """
+    points_xy = np.asarray(points_xy, dtype=np.float64).reshape(-1, 2)
+    line_oids = np.asarray(line_oids, dtype=np.int64)
+    result = np.full(len(points_xy), np.nan)
+    for oid in np.unique(line_oids):
+        if oid == -1:
+            continue
+        mask = line_oids == oid
+        result[mask] = measure_points(chainages[int(oid)], points_xy[mask])
+    return result
+
+def segment_parts(chainage, measure):
+    """
+    Vertex arrays (one per part) of the piece of the centerline from its start to `measure`.
+    The last vertex index at or before `measure` is found by binary search over the cumulative
+    measures, so only the prefix being returned is touched.
+    """
+    vertices, measures, part_offsets = chainage["vertices"], chainage["measures"], chainage["part_offsets"]
+    measure = min(max(float(measure), 0.0), chainage["length"])
+    k = int(np.searchsorted(measures, measure, side="right")) - 1
+    end_point = None
+    if k < len(vertices) - 1 and measure > measures[k]:
+        t = (measure - measures[k]) / (measures[k + 1] - measures[k])
+        end_point = vertices[k] + t * (vertices[k + 1] - vertices[k])
+
+    parts = []
+    for p in range(len(part_offsets) - 1):
+        lo, hi = part_offsets[p], part_offsets[p + 1]
+        if lo > k:
+            break
+        part = vertices[lo:min(hi, k + 1)]
+        if end_point is not None and k < hi:
+            part = np.vstack([part, end_point])
+        if len(part) >= 2:
+            parts.append(part)
+    if not parts:
+        # Zero-length prefix: keep a degenerate segment at the line start, like segmentAlongLine(0, 0).
+        parts.append(np.repeat(vertices[:1], 2, axis=0))
+    return parts
+
+def points_at_measures(chainage, measures):
+    """
+    (N, 2) coordinates of the points at the given distances along the centerline, i.e. the last
+    vertex of segment_parts() for each measure, found by binary search without building the prefix.
+    """
+    vertices, cumulative = chainage["vertices"], chainage["measures"]
+    measures = np.clip(np.asarray(measures, dtype=np.float64), 0.0, chainage["length"])
+    k = np.searchsorted(cumulative, measures, side="right") - 1
+    # Exactly on a part break the prefix ends at the last vertex of the earlier part, as in segment_parts().
+    k = np.where(np.isin(k, chainage["part_offsets"][1:-1]) & (measures == cumulative[k]), k - 1, k)
+    # A measure on a vertex (or at the very end) lands on vertex k itself; otherwise interpolate towards k + 1.
+    inside = (k < len(vertices) - 1) & (measures > cumulative[k])
+    nxt = np.minimum(k + 1, len(vertices) - 1)
+    span = cumulative[nxt] - cumulative[k]
+    t = np.divide(measures - cumulative[k], span, out=np.zeros_like(measures), where=inside & (span > 0))
+    return vertices[k] + t[:, None] * (vertices[nxt] - vertices[k])
+
+def segment_polyline(chainage, measure, spatial_ref):
+    # Build the arcpy Polyline from the start of the centerline to `measure`.
+    parts = segment_parts(chainage, measure)
+    return arcpy.Polyline(arcpy.Array([arcpy.Array([arcpy.Point(x, y) for x, y in part]) for part in parts]),
+                          spatial_ref)
+
+def segment_geometry(chainage, measure):
+    # Shapely geometry from the start of the centerline to `measure` (backend-neutral).
+    parts = segment_parts(chainage, measure)
+    return LineString(parts[0]) if len(parts) == 1 else MultiLineString(parts)
@@ -0,0 +1,58 @@
+import os
+from contextlib import nullcontext
+
+from shapely.geometry import LineString
+
+from backends import default_backend
+from near_engine import WITHIN_50FT
+
+def connection_line_parts(near_rows):
+    """
+    Turn Near results into 2-vertex connection lines in one streaming pass.
+    near_rows yields (connection_num, (x, y), near_x, near_y); the generator yields
+    (connection_num, (x, y), (near_x, near_y)) for every row with a valid Near location.
+    The line runs from the original point to its snapped location, the same vertex order
+    PointsToLine produced from Append_Points.
+    """
+    for connection_num, point_xy, near_x, near_y in near_rows:
+        if point_xy is None or point_xy[0] is None or near_x is None or near_y is None:
+            continue
+        yield connection_num, point_xy, (near_x, near_y)
+
+def build_connection_lines(point_fc, workspace, output_fc, where_clause=WITHIN_50FT, line_points_fc=None,
+                           backend=None):
+    """
+    Build Connection_Lines straight from the Near fields on point_fc, replacing the
+    Append_Points export -> XY event layer export -> Append -> PointsToLine chain.
+    One SearchCursor over the selected points feeds one InsertCursor per output, so no
+    intermediate feature classes are written. If line_points_fc is given, the snapped
+    points on the line (NEAR_X/NEAR_Y) are written to it in the same pass.
+    Returns the path of the connection lines feature class.
+    """
+    backend = backend or default_backend()
+    sr = backend.spatial_reference(point_fc)
+    outputs = [(output_fc, "POLYLINE")]
+    if line_points_fc:
+        outputs.append((line_points_fc, "POINT"))
+    for name, geometry_type in outputs:
+        path = os.path.join(workspace, name)
+        if backend.exists(path):
+            backend.delete(path)
+        backend.create_feature_class(workspace, name, geometry_type, sr)
+        backend.add_field(path, "ConnectionNum", "LONG")
+
+    output_path = os.path.join(workspace, output_fc)
+    line_count = 0
+    point_cursor = nullcontext()
+    if line_points_fc:
+        point_cursor = backend.insert_cursor(os.path.join(workspace, line_points_fc), ["SHAPE@XY", "ConnectionNum"])
+    with backend.insert_cursor(output_path, ["SHAPE@", "ConnectionNum"]) as line_cursor, point_cursor, \
+            backend.search_cursor(point_fc, ["ConnectionNum", "SHAPE@XY", "NEAR_X", "NEAR_Y"], where_clause) as s_cursor:
+        for connection_num, start, end in connection_line_parts(s_cursor):
+            line_cursor.insertRow([LineString([start, end]), connection_num])
+            if line_points_fc:
+                point_cursor.insertRow([end, connection_num])
+            line_count += 1
+
+    backend.message(f"Created {line_count} connection lines: {output_fc}")
+    return output_path
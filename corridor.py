@@ -0,0 +1,85 @@
+import hashlib
+import os
+
+import numpy as np
+import shapely
+
+from backends import default_backend
+from centerline_cache import MAX_CACHE_BYTES, evict_cache, touch
+from scratch import atomic_write
+
+def corridor_cache_key(line_geoms, distance, cap_style):
+    """
+    Hash of the centerline geometries plus the buffer parameters.
+    Per-line WKB digests are sorted first, so the key does not depend on row order.
+    """
+    digests = sorted(hashlib.sha256(wkb).hexdigest() for wkb in shapely.to_wkb(line_geoms))
+    key = hashlib.sha256("\n".join(digests).encode("ascii"))
+    key.update(f"|{float(distance)!r}|{cap_style}".encode("ascii"))
+    return key.hexdigest()
+
+def build_corridor(line_geoms, distance=50, cap_style="flat", cache_dir=None, max_bytes=MAX_CACHE_BYTES):
+    """
+    Buffer every centerline and merge the results with a unary union.
+    When cache_dir is given the polygon is stored there as WKB, keyed by corridor_cache_key(),
+    and later calls with the same centerlines and parameters load it instead of buffering again.
+    The folder is kept under max_bytes together with the chainage tables (see centerline_cache).
+    """
+    line_geoms = np.asarray(line_geoms, dtype=object)
+    cache_path = None
+    if cache_dir:
+        key = corridor_cache_key(line_geoms, distance, cap_style)
+        cache_path = os.path.join(cache_dir, f"corridor_{key}.wkb")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as f:
+                corridor = shapely.from_wkb(f.read())
+            touch(cache_path)
+            return corridor
+
+    corridor = shapely.union_all(shapely.buffer(line_geoms, distance, cap_style=cap_style))
+
+    if cache_path:
+        os.makedirs(cache_dir, exist_ok=True)
+        with atomic_write(cache_path, "wb") as f:
+            f.write(shapely.to_wkb(corridor))
+        evict_cache(cache_dir, max_bytes, keep=cache_path)
+    return corridor
+
+def outside_corridor(corridor, geoms):
+    """
+    Boolean mask of the geometries that are NOT strictly inside the corridor polygon.
+    A geometry touching the corridor edge counts as outside, matching the old
+    COMPLETELY_WITHIN + invert selection that also removed edge features.
+    The corridor is prepared once and tested against the whole geometry array in one call.
+    """
+    geoms = np.asarray(geoms, dtype=object)
+    shapely.prepare(corridor)
+    inside = shapely.contains_properly(corridor, geoms)
+    # Empty geometries are never inside anything.
+    return ~(inside & ~shapely.is_empty(geoms))
+
+def delete_outside_corridor(corridor, fc, backend=None):
+    """
+    Delete the features of fc that are not strictly inside the corridor polygon.
+    Reads the geometries once, tests them in a batch and removes the failing OIDs
+    in one UpdateCursor pass. Returns the number of deleted features.
+    """
+    backend = backend or default_backend()
+    oids, geoms = [], []
+    null_oids = set()
+    with backend.search_cursor(fc, ["OID@", "SHAPE@"]) as cursor:
+        for oid, geom in cursor:
+            if geom is None:
+                null_oids.add(oid)
+            else:
+                oids.append(oid)
+                geoms.append(geom)
+
+    outside = outside_corridor(corridor, geoms) if geoms else np.empty(0, dtype=bool)
+    delete_oids = null_oids.union(np.asarray(oids, dtype=np.int64)[outside].tolist())
+    if delete_oids:
+        with backend.update_cursor(fc, ["OID@"]) as cursor:
+            for (oid,) in cursor:
+                if oid in delete_oids:
+                    cursor.deleteRow()
+    return len(delete_oids)
@@ -1,62 +1,70 @@
-import arcpy, os
-
-def generate_segments(main_line_fc, snapped_points_fc, output_fc_name):
-    """Generate polylines from the start of a main polyline to each snapped point along it."""
-    arcpy.env.overwriteOutput = True  # Overwrite output if it exists
-    
-    # Determine the geodatabase workspace and spatial reference from the main polyline feature class
-    workspace = os.path.dirname(arcpy.Describe(main_line_fc).catalogPath)  # path to the .gdb
-    spatial_ref = arcpy.Describe(main_line_fc).spatialReference
-    
-    # Create the output feature class in the same geodatabase
-    output_fc_path = os.path.join(workspace, output_fc_name)
-    if arcpy.Exists(output_fc_path):
-        arcpy.management.Delete(output_fc_path)
-    arcpy.management.CreateFeatureclass(workspace, output_fc_name, "POLYLINE", 
-                                        spatial_reference=spatial_ref)
-    
-    # Read all polyline geometries into a dictionary (OID -> geometry) for quick access
-    polyline_geoms = {}
-    with arcpy.da.SearchCursor(main_line_fc, ["OID@", "SHAPE@"]) as line_cursor:
-        for oid, shape in line_cursor:
-            polyline_geoms[oid] = shape
-    
-    # Prepare an insert cursor to add new polyline segments to the output feature class
-    insert_fields = ["SHAPE@"]  # we are only inserting the geometry
-    with arcpy.da.InsertCursor(output_fc_path, insert_fields) as insert_cursor:
-        # Iterate through each snapped point
-        with arcpy.da.SearchCursor(snapped_points_fc, ["SHAPE@"]) as point_cursor:
-            for point_geom, in point_cursor:
-                # Identify which polyline this point lies on. If only one line, use it directly.
-                if len(polyline_geoms) == 1:
-                    line_geom = next(iter(polyline_geoms.values()))
-                else:
-                    # Find the polyline geometry that contains this point (distance == 0)
-                    line_geom = None
-                    for geom in polyline_geoms.values():
-                        if geom.distanceTo(point_geom) == 0:
-                            line_geom = geom
-                            break
-                    if line_geom is None:
-                        continue  # skip point if it’s not on any polyline (should not happen if snapped)
-                
-                # Measure distance along the line from the start to the point’s position
-                dist_along = line_geom.measureOnLine(point_geom, use_percentage=False)  
-                # Create a polyline segment from the start (0) to this distance along the line
-                segment = line_geom.segmentAlongLine(0, dist_along, use_percentage=False)
-                
-                # Insert the new segment geometry as a feature
-                insert_cursor.insertRow([segment])
-    # Return the path of the output feature class
-    return output_fc_path
-
-def main():
-    # Set valid paths for your environment.
-    main_line = r"PATH_TO_FC"
-    snapped_pts = r"PATH_TO_FC"
-    output_fc = "RouteSegments"
-    result = generate_segments(main_line, snapped_pts, output_fc)
-    print("Generated route segments at:", result)
-
-if __name__ == "__main__":
-    main()
+import arcpy, os
+import numpy as np
+from centerline_index import build_centerline_index, match_points_to_centerlines
+from chainage import build_chainage, station_points, segment_polyline
+from geometry_arrays import iter_point_chunks
+
+def generate_segments(main_line_fc, snapped_points_fc, output_fc_name):
+    """Generate polylines from the start of a main polyline to each snapped point along it."""
+    arcpy.env.overwriteOutput = True  # Overwrite output if it exists
+    
+    # Determine the geodatabase workspace and spatial reference from the main polyline feature class
+    workspace = os.path.dirname(arcpy.Describe(main_line_fc).catalogPath)  # path to the .gdb
+    spatial_ref = arcpy.Describe(main_line_fc).spatialReference
+    
+    # Create the output feature class in the same geodatabase
+    output_fc_path = os.path.join(workspace, output_fc_name)
+    if arcpy.Exists(output_fc_path):
+        arcpy.management.Delete(output_fc_path)
+    arcpy.management.CreateFeatureclass(workspace, output_fc_name, "POLYLINE", 
+                                        spatial_reference=spatial_ref)
+    
+    # Read all polyline geometries into a dictionary (OID -> geometry) for quick access
+    polyline_geoms = {}
+    with arcpy.da.SearchCursor(main_line_fc, ["OID@", "SHAPE@"]) as line_cursor:
+        for oid, shape in line_cursor:
+            polyline_geoms[oid] = shape
+
+    # Precompute the vertex and cumulative-length arrays of every centerline once
+    chainages = {oid: build_chainage(geom) for oid, geom in polyline_geoms.items()}
+    
+    # Find the polyline each point lies on (within tolerance) through an STRtree built once.
+    line_index = build_centerline_index(polyline_geoms) if len(polyline_geoms) > 1 else None
+
+    # Prepare an insert cursor to add new polyline segments to the output feature class
+    insert_fields = ["SHAPE@"]  # we are only inserting the geometry
+    with arcpy.da.InsertCursor(output_fc_path, insert_fields) as insert_cursor:
+        # Stream the snapped points in chunks: each chunk is stationed in one vectorized call
+        # and its segments are inserted before the next chunk is read.
+        for _, points_xy, _ in iter_point_chunks(snapped_points_fc):
+            # Identify which polyline each point lies on. If only one line, use it directly.
+            if line_index is None:
+                line_oids = np.full(len(points_xy), next(iter(polyline_geoms)))
+            else:
+                line_oids = match_points_to_centerlines(line_index, points_xy)
+
+            # Measure distance along the line from the start to each point’s position
+            measures = station_points(chainages, points_xy, line_oids)
+
+            # Iterate through each snapped point
+            for line_oid, dist_along in zip(line_oids.tolist(), measures.tolist()):
+                if line_oid == -1:
+                    continue  # skip point if it’s not on any polyline (should not happen if snapped)
+                # Create a polyline segment from the start (0) to this distance along the line
+                segment = segment_polyline(chainages[line_oid], dist_along, spatial_ref)
+
+                # Insert the new segment geometry as a feature
+                insert_cursor.insertRow([segment])
+    # Return the path of the output feature class
+    return output_fc_path
+
+def main():
+    # Set valid paths for your environment.
+    main_line = r"PATH_TO_FC"
+    snapped_pts = r"PATH_TO_FC"
+    output_fc = "RouteSegments"
+    result = generate_segments(main_line, snapped_pts, output_fc)
+    print("Generated route segments at:", result)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+import numpy as np
+import shapely
+
+from backends import default_backend
+
+# Rows read per chunk by the streaming readers; bounds the number of Python row objects alive at once.
+CHUNK_SIZE = 50000
+
+def polyline_parts(geom):
+    """
+    Return the parts of a polyline as a list of (n, 2) float64 vertex arrays.
+    Works for arcpy Polylines and Shapely LineStrings/MultiLineStrings alike, since
+    both expose __geo_interface__. Z/M values are dropped and degenerate parts are skipped.
+    """
+    geo = geom.__geo_interface__
+    if geo["type"] == "LineString":
+        coords = [geo["coordinates"]]
+    elif geo["type"] == "MultiLineString":
+        coords = geo["coordinates"]
+    else:
+        raise ValueError(f"Expected a polyline geometry, got {geo['type']}.")
+    parts = []
+    for part in coords:
+        if len(part) < 2:
+            continue
+        parts.append(np.asarray([pt[:2] for pt in part], dtype=np.float64))
+    return parts
+
+def segments_from_lines(line_geoms):
+    """
+    Explode polylines into flat segment arrays.
+    line_geoms is a dict of OID -> polyline geometry.
+    Returns (starts, ends, seg_oids) where starts/ends are (S, 2) arrays and seg_oids
+    holds the OID of the polyline each segment came from.
+    """
+    starts, ends, seg_oids = [], [], []
+    for oid, geom in line_geoms.items():
+        for part in polyline_parts(geom):
+            starts.append(part[:-1])
+            ends.append(part[1:])
+            seg_oids.append(np.full(len(part) - 1, oid, dtype=np.int64))
+    if not starts:
+        empty = np.empty((0, 2), dtype=np.float64)
+        return empty, empty.copy(), np.empty(0, dtype=np.int64)
+    return np.concatenate(starts), np.concatenate(ends), np.concatenate(seg_oids)
+
+def read_line_geoms(line_fc, backend=None):
+    # Read all polyline geometries into a dictionary (OID -> Shapely geometry).
+    backend = backend or default_backend()
+    line_geoms = {}
+    with backend.search_cursor(line_fc, ["OID@", "SHAPE@"]) as cursor:
+        for oid, geom in cursor:
+            if geom is not None:
+                line_geoms[oid] = geom
+    return line_geoms
+
+def read_point_xy(point_fc, where_clause=None, backend=None):
+    """
+    Read point OIDs and coordinates into arrays: (oids, xy) with xy shaped (N, 2).
+    Features with empty geometry are skipped.
+    """
+    backend = backend or default_backend()
+    oids, xy = [], []
+    with backend.search_cursor(point_fc, ["OID@", "SHAPE@XY"], where_clause) as cursor:
+        for oid, point in cursor:
+            if point is None or point[0] is None:
+                continue
+            oids.append(oid)
+            xy.append(point)
+    return np.asarray(oids, dtype=np.int64), np.asarray(xy, dtype=np.float64).reshape(-1, 2)
+
+def iter_point_chunks(point_fc, fields=(), where_clause=None, chunk_size=CHUNK_SIZE, backend=None):
+    """
+    Stream a point feature class in chunks of at most chunk_size rows from one search cursor.
+    Yields (oids, xy, extra): an int64 OID array, an (n, 2) coordinate array and one list per
+    name in fields. Features with empty geometry are skipped.
+    """
+    backend = backend or default_backend()
+    oids, xy, extra = [], [], [[] for _ in fields]
+    with backend.search_cursor(point_fc, ["OID@", "SHAPE@XY"] + list(fields), where_clause) as cursor:
+        for row in cursor:
+            if row[1] is None or row[1][0] is None:
+                continue
+            oids.append(row[0])
+            xy.append(row[1])
+            for column, value in zip(extra, row[2:]):
+                column.append(value)
+            if len(oids) == chunk_size:
+                yield np.asarray(oids, dtype=np.int64), np.asarray(xy, dtype=np.float64), extra
+                oids, xy, extra = [], [], [[] for _ in fields]
+    if oids:
+        yield np.asarray(oids, dtype=np.int64), np.asarray(xy, dtype=np.float64).reshape(-1, 2), extra
+
+def to_shapely(geoms):
+    # Convert arcpy geometries to a Shapely geometry array in one vectorized WKB parse.
+    return shapely.from_wkb([bytes(geom.WKB) for geom in geoms])
@@ -0,0 +1,94 @@
+import hashlib, json, os
+
+import numpy as np
+
+from backends import default_backend
+from centerline_cache import spatial_reference_text
+from corridor import build_corridor, corridor_cache_key
+from geometry_arrays import read_line_geoms, read_point_xy
+from parallel_stationing import station_routes, write_station_results
+from scratch import atomic_write
+
+# Bump when the stationing rules change, so fingerprints from older runs force a full run.
+# 2: every handhole is stationed from its own snapped point (no more 1 ft chain between neighbours).
+FINGERPRINT_VERSION = 2
+
+def point_fingerprints(oids, points_xy):
+    # OID -> short hash of the point's coordinates; a moved handhole gets a new hash.
+    points_xy = np.ascontiguousarray(points_xy, dtype=np.float64).reshape(-1, 2)
+    return {str(oid): hashlib.blake2b(xy.tobytes(), digest_size=8).hexdigest()
+            for oid, xy in zip(np.asarray(oids).tolist(), points_xy)}
+
+def centerline_fingerprint(line_geoms, spatial_ref, radius):
+    # Hash of every centerline geometry, the spatial reference and the search radius.
+    key = corridor_cache_key(list(line_geoms), radius, "flat")
+    return hashlib.sha256(f"{key}|{spatial_reference_text(spatial_ref)}|{FINGERPRINT_VERSION}".encode()).hexdigest()
+
+def diff_fingerprints(old, new):
+    """
+    Compare two OID -> hash maps.
+    Returns (added, moved, deleted) as sets of OIDs (the JSON keys are strings).
+    """
+    added = {oid for oid in new if oid not in old}
+    moved = {oid for oid in new if oid in old and old[oid] != new[oid]}
+    deleted = {oid for oid in old if oid not in new}
+    return added, moved, deleted
+
+def load_fingerprints(path):
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+def save_fingerprints(path, centerline, points):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with atomic_write(path) as f:
+        json.dump({"version": FINGERPRINT_VERSION, "centerline": centerline, "points": points}, f)
+
+def record_fingerprints(point_fc, line_fc, state_path, radius=50, backend=None):
+    # Store the fingerprints of the current handholes and centerline (after a full run).
+    backend = backend or default_backend()
+    line_geoms = read_line_geoms(line_fc, backend)
+    point_oids, points_xy = read_point_xy(point_fc, backend=backend)
+    save_fingerprints(state_path,
+                      centerline_fingerprint(line_geoms.values(), backend.spatial_reference(line_fc), radius),
+                      point_fingerprints(point_oids, points_xy))
+
+def restation_incremental(point_fc, line_fc, format_station, state_path, radius=50, cache_dir=None, backend=None):
+    """
+    Re-station only the handholes that were added or moved since the fingerprints in state_path
+    were recorded. Their Near fields and stations are recomputed and written; the stations are cleared
+    on a moved handhole that is no longer within the corridor. Deleted handholes are dropped from the state.
+    A handhole's station depends only on its own position and the centerline, so the untouched
+    handholes keep exactly what a full run would give them.
+
+    Returns None, without writing anything, when there is no usable state or the centerline (or its
+    spatial reference) changed; the caller then runs the full workflow and calls record_fingerprints().
+    Otherwise returns (added, moved, deleted) counts.
+    """
+    backend = backend or default_backend()
+    state = load_fingerprints(state_path)
+    if not state or state.get("version") != FINGERPRINT_VERSION:
+        return None
+    line_geoms = read_line_geoms(line_fc, backend)
+    centerline = centerline_fingerprint(line_geoms.values(), backend.spatial_reference(line_fc), radius)
+    if centerline != state["centerline"]:
+        backend.message("Centerline changed since the last run; falling back to a full run.")
+        return None
+
+    point_oids, points_xy = read_point_xy(point_fc, backend=backend)
+    points = point_fingerprints(point_oids, points_xy)
+    added, moved, deleted = diff_fingerprints(state["points"], points)
+    changed = np.isin(point_oids, np.fromiter((int(oid) for oid in added | moved), dtype=np.int64))
+    if changed.any():
+        # The corridor comes from the cache while the centerline is unchanged, so this is cheap.
+        corridor = build_corridor(list(line_geoms.values()), radius, cap_style="flat", cache_dir=cache_dir)
+        oids, near, measures = station_routes(line_geoms, point_oids[changed], points_xy[changed], corridor,
+                                              radius, max_workers=1, spatial_ref=backend.spatial_reference(line_fc),
+                                              cache_dir=cache_dir)
+        write_station_results(point_fc, oids, near, measures, format_station, clear_unstationed=True,
+                              backend=backend)
+
+    save_fingerprints(state_path, centerline, points)
+    backend.message(f"Incremental run: {len(added)} added, {len(moved)} moved, {len(deleted)} deleted handholes.")
+    return len(added), len(moved), len(deleted)
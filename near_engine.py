@@ -0,0 +1,155 @@
+import numpy as np
+import shapely
+from scipy.spatial import cKDTree
+
+from backends import default_backend
+from geometry_arrays import read_line_geoms, read_point_xy, segments_from_lines
+
+# Points are queried against the segment STRtree in slices of PAIR_BUDGET // 16, which keeps the
+# temporary candidate pair arrays at a few tens of MB.
+PAIR_BUDGET = 2 ** 21
+
+NEAR_FIELDS = [("NEAR_FID", "LONG"), ("NEAR_DIST", "DOUBLE"), ("NEAR_X", "DOUBLE"),
+               ("NEAR_Y", "DOUBLE"), ("NEAR_ANGLE", "DOUBLE")]
+
+# Points Near placed within 50 ft. Like the Near tool, points beyond the search radius get
+# NEAR_DIST -1, so the lower bound is needed as well.
+WITHIN_50FT = "NEAR_DIST >= 0 AND NEAR_DIST <= 50"
+
+def near_arrays(points_xy, starts, ends, seg_oids, pair_budget=PAIR_BUDGET, search_radius=None):
+    """
+    Planar equivalent of Near (LOCATION, ANGLE) computed with NumPy.
+    Spatial indexes narrow each point to the segments that can be nearest (see _near_nearest),
+    which are projected exactly in batches of pair_budget // 16 points; the closest projection wins.
+    With search_radius, only points within that distance of a line are located, as with the Near
+    tool's search radius; the others keep the -1 defaults. Those points are pruned before any
+    distance is computed (see _near_within_radius), so far-away handholes cost next to nothing.
+
+    Returns a dict of arrays keyed like the Near tool output fields:
+        NEAR_FID   - OID of the nearest line (-1 when there are no segments)
+        NEAR_DIST  - distance to the nearest location on the line
+        NEAR_X/Y   - coordinates of that nearest location
+        NEAR_ANGLE - degrees from the x-axis of the direction point -> near location (-180..180)
+    """
+    points_xy = np.asarray(points_xy, dtype=np.float64).reshape(-1, 2)
+    n_points = len(points_xy)
+    result = {
+        "NEAR_FID": np.full(n_points, -1, dtype=np.int64),
+        "NEAR_DIST": np.full(n_points, -1.0),
+        "NEAR_X": np.full(n_points, -1.0),
+        "NEAR_Y": np.full(n_points, -1.0),
+        "NEAR_ANGLE": np.zeros(n_points),
+    }
+    if n_points == 0 or len(starts) == 0:
+        return result
+    if search_radius is not None:
+        return _near_within_radius(points_xy, starts, ends, seg_oids, search_radius, pair_budget, result)
+    return _near_nearest(points_xy, starts, ends, seg_oids, pair_budget, result)
+
+def _near_nearest(points_xy, starts, ends, seg_oids, pair_budget, result):
+    """
+    near_arrays() without a search radius: every point is located on its nearest segment.
+    The distance to the nearest segment vertex (a KD-tree query) bounds the distance to the
+    nearest segment, so an STRtree "dwithin" query over the segments at that distance (plus a hair
+    for GEOS rounding) returns every segment that can be nearest; only those are projected exactly.
+    Ties go to the lowest segment index, as in an all-pairs scan.
+    """
+    vertex_tree = cKDTree(np.vstack([starts, ends]))
+    tree = shapely.STRtree(shapely.linestrings(np.stack([starts, ends], axis=1)))
+    for lo in range(0, len(points_xy), pair_budget // 16):
+        point_idx = np.arange(lo, min(lo + pair_budget // 16, len(points_xy)))
+        bound, _ = vertex_tree.query(points_xy[point_idx])
+        pair_point, seg = tree.query(shapely.points(points_xy[point_idx]), predicate="dwithin",
+                                     distance=bound * (1 + 1e-9) + 1e-9)
+        _closest_on_segments(points_xy, point_idx[pair_point], seg, starts, ends, seg_oids, result)
+    result["NEAR_ANGLE"][result["NEAR_DIST"] == 0] = 0.0
+    return result
+
+def _near_within_radius(points_xy, starts, ends, seg_oids, search_radius, pair_budget, result):
+    """
+    near_arrays() with a search radius, in three steps:
+    1. Envelope test: points outside the bounding box of all segments grown by the radius are dropped.
+    2. Candidate lookup: an STRtree over the segment envelopes grown by the radius gives, for each
+       remaining point, the segments it could be within range of (a box test, no distances yet).
+    3. Exact projection onto the candidate segments only, keeping the closest one within the radius.
+    Ties go to the lowest segment index, as in _near_nearest.
+    """
+    radius = float(search_radius)
+    seg_min = np.minimum(starts, ends) - radius
+    seg_max = np.maximum(starts, ends) + radius
+    inside = np.all((points_xy >= seg_min.min(axis=0)) & (points_xy <= seg_max.max(axis=0)), axis=1)
+    candidates = np.flatnonzero(inside)
+    if len(candidates) == 0:
+        return result
+    tree = shapely.STRtree(shapely.box(seg_min[:, 0], seg_min[:, 1], seg_max[:, 0], seg_max[:, 1]))
+
+    # Query in slices of points so the candidate pair arrays stay bounded.
+    for lo in range(0, len(candidates), pair_budget // 16):
+        point_idx = candidates[lo:lo + pair_budget // 16]
+        pair_point, seg = tree.query(shapely.points(points_xy[point_idx]))
+        _closest_on_segments(points_xy, point_idx[pair_point], seg, starts, ends, seg_oids, result, radius)
+
+    result["NEAR_ANGLE"][result["NEAR_DIST"] == 0] = 0.0
+    return result
+
+def _closest_on_segments(points_xy, pair_point, seg, starts, ends, seg_oids, result, radius=None):
+    """
+    Project each (point, candidate segment) pair exactly and write the closest segment of every
+    point into result (only when it is within radius, if one is given).
+    Ties go to the lowest segment index.
+    """
+    if len(seg) == 0:
+        return
+    px, py = points_xy[pair_point, 0], points_xy[pair_point, 1]
+    sx, sy = starts[seg, 0], starts[seg, 1]
+    dx, dy = ends[seg, 0] - sx, ends[seg, 1] - sy
+    # Segment squared lengths; zero-length segments project onto their start.
+    len2 = dx * dx + dy * dy
+    inv_len2 = np.divide(1.0, len2, out=np.zeros_like(len2), where=len2 > 0)
+    t = ((px - sx) * dx + (py - sy) * dy) * inv_len2
+    np.clip(t, 0.0, 1.0, out=t)
+    cx = sx + t * dx
+    cy = sy + t * dy
+    dist2 = (px - cx) ** 2 + (py - cy) ** 2
+
+    # Closest candidate per point: sort by point, then distance, then segment index.
+    order = np.lexsort((seg, dist2, pair_point))
+    first = order[np.r_[True, pair_point[order][1:] != pair_point[order][:-1]]]
+    if radius is not None:
+        first = first[dist2[first] <= radius * radius]
+    i = pair_point[first]
+    result["NEAR_FID"][i] = seg_oids[seg[first]]
+    result["NEAR_DIST"][i] = np.sqrt(dist2[first])
+    result["NEAR_X"][i] = cx[first]
+    result["NEAR_Y"][i] = cy[first]
+    result["NEAR_ANGLE"][i] = np.degrees(np.arctan2(cy[first] - py[first], cx[first] - px[first]))
+
+def near_analysis(point_fc, line_fc, backend=None, search_radius=None):
+    """
+    Drop-in replacement for arcpy.Near_analysis(point_fc, line_fc, search_radius, location="LOCATION", angle="ANGLE").
+    Reads the centerline segments and point coordinates once, runs near_arrays() and writes
+    NEAR_FID, NEAR_DIST, NEAR_X, NEAR_Y and NEAR_ANGLE back with a single UpdateCursor pass.
+    Returns the result arrays along with the point OIDs they belong to.
+    """
+    backend = backend or default_backend()
+    starts, ends, seg_oids = segments_from_lines(read_line_geoms(line_fc, backend))
+    oids, points_xy = read_point_xy(point_fc, backend=backend)
+    result = near_arrays(points_xy, starts, ends, seg_oids, search_radius=search_radius)
+
+    # Add any Near output fields that are missing, matching the Near tool's field types.
+    existing = backend.list_fields(point_fc)
+    for name, field_type in NEAR_FIELDS:
+        if name not in existing:
+            backend.add_field(point_fc, name, field_type)
+
+    # Write the results keyed by OID; features with empty geometry get the tool's -1 defaults.
+    row_index = dict(zip(oids.tolist(), range(len(oids))))
+    field_names = [name for name, _ in NEAR_FIELDS]
+    with backend.update_cursor(point_fc, ["OID@"] + field_names) as cursor:
+        for row in cursor:
+            i = row_index.get(row[0])
+            if i is None:
+                cursor.updateRow([row[0], -1, -1.0, -1.0, -1.0, 0.0])
+            else:
+                cursor.updateRow([row[0]] + [result[name][i].item() for name in field_names])
+    return oids, result
@@ -0,0 +1,156 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from backends import default_backend
+from centerline_cache import cached_chainage, spatial_reference_text
+from chainage import measure_points
+from corridor import build_corridor, outside_corridor
+from geometry_arrays import read_line_geoms, read_point_xy, segments_from_lines
+from near_engine import NEAR_FIELDS, near_arrays
+from station_fields import STATION_FIELD, add_station_fields
+
+# Corridor polygon shared by every task in a worker process, set once by _init_worker.
+_WORKER_CORRIDOR = None
+
+def partition_by_route(route_oids, route_geoms, points_xy):
+    """
+    OID of the nearest route for every point, from one bulk STRtree nearest query.
+    A point equally close to several routes goes to the one listed first, so the
+    partition does not depend on the tree's internal order.
+    """
+    points_xy = np.asarray(points_xy, dtype=np.float64).reshape(-1, 2)
+    route_oids = np.asarray(route_oids, dtype=np.int64)
+    if len(points_xy) == 0 or len(route_oids) == 0:
+        return np.full(len(points_xy), -1, dtype=np.int64)
+    point_idx, tree_idx = STRtree(route_geoms).query_nearest(shapely.points(points_xy), all_matches=True)
+    nearest = np.full(len(points_xy), len(route_oids), dtype=np.int64)
+    np.minimum.at(nearest, point_idx, tree_idx)
+    return route_oids[nearest]
+
+def _init_worker(corridor_wkb):
+    global _WORKER_CORRIDOR
+    _WORKER_CORRIDOR = shapely.from_wkb(corridor_wkb)
+    shapely.prepare(_WORKER_CORRIDOR)
+
+def _station_route(task):
+    """
+    Station one route's handholes (runs in a worker process).
+    task is (route_oid, route_wkb, point_oids, points_xy, radius, spatial_ref, cache_dir).
+    This is the serial pipeline's stationing rule (see Stationizer_v2.selectionpaluza): Near onto the
+    route, keep points within radius whose connection line lies strictly inside the corridor, and give
+    each one the measure of its own snapped point along the route. No handhole's station depends on
+    another's, so partitioning the handholes cannot change the result.
+    Returns (point_oids, near arrays dict, measures) with NaN measures for points that are not stationed.
+    """
+    route_oid, route_wkb, point_oids, points_xy, radius, spatial_ref, cache_dir = task
+    route = shapely.from_wkb(route_wkb)
+    starts, ends, seg_oids = segments_from_lines({route_oid: route})
+    near = near_arrays(points_xy, starts, ends, seg_oids, search_radius=radius)
+
+    near_xy = np.column_stack([near["NEAR_X"], near["NEAR_Y"]])
+    stationed = (near["NEAR_FID"] != -1) & (near["NEAR_DIST"] <= radius)
+    idx = np.flatnonzero(stationed)
+    if len(idx):
+        connection_lines = shapely.linestrings(np.stack([points_xy[idx], near_xy[idx]], axis=1))
+        stationed[idx[outside_corridor(_WORKER_CORRIDOR, connection_lines)]] = False
+
+    measures = np.full(len(point_oids), np.nan)
+    if stationed.any():
+        measures[stationed] = measure_points(cached_chainage(route, spatial_ref, cache_dir), near_xy[stationed])
+    return point_oids, near, measures
+
+def station_routes(route_geoms, point_oids, points_xy, corridor, radius=50, max_workers=None, spatial_ref=None,
+                   cache_dir=None):
+    """
+    Partition the points by nearest route and station each partition in a worker process.
+    route_geoms is a dict of OID -> Shapely polyline. With cache_dir, the workers load each
+    route's chainage table from the centerline cache instead of rebuilding it. Returns (point_oids, near, measures) sorted by
+    point OID, so the merged result is the same whatever order the workers finish in.
+    With max_workers=1 the partitions run in this process, which is easier to debug.
+    """
+    route_oids = np.fromiter(route_geoms, dtype=np.int64, count=len(route_geoms))
+    owners = partition_by_route(route_oids, list(route_geoms.values()), points_xy)
+    spatial_ref = spatial_reference_text(spatial_ref)
+    tasks = []
+    for route_oid in route_oids.tolist():
+        mask = owners == route_oid
+        if mask.any():
+            tasks.append((route_oid, shapely.to_wkb(route_geoms[route_oid]), point_oids[mask], points_xy[mask], radius,
+                          spatial_ref, cache_dir))
+
+    corridor_wkb = shapely.to_wkb(corridor)
+    if max_workers == 1 or len(tasks) <= 1:
+        _init_worker(corridor_wkb)
+        results = [_station_route(task) for task in tasks]
+    else:
+        # The corridor goes to each worker once through the initializer rather than with every task.
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker,
+                                 initargs=(corridor_wkb,)) as executor:
+            results = list(executor.map(_station_route, tasks))
+
+    if not results:
+        return np.empty(0, dtype=np.int64), near_arrays(np.empty((0, 2)), *segments_from_lines({})), np.empty(0)
+    merged_oids = np.concatenate([r[0] for r in results])
+    order = np.argsort(merged_oids, kind="stable")
+    near = {name: np.concatenate([r[1][name] for r in results])[order] for name, _ in NEAR_FIELDS}
+    measures = np.concatenate([r[2] for r in results])[order]
+    return merged_oids[order], near, measures
+
+def station_handholes_parallel(point_fc, line_fc, format_station, radius=50, max_workers=None, cache_dir=None,
+                               backend=None):
+    """
+    Parallel stationing mode for workspaces with many independent centerlines.
+    Reads every route and handhole once, stations the partitions in a process pool and writes the
+    Near fields plus STATIONING back in a single cursor pass. No intermediate feature classes are
+    created. format_station turns a measure in feet into the station string.
+    Returns a dict of handhole OID -> STATIONING for the handholes that were stationed.
+    """
+    backend = backend or default_backend()
+    route_geoms = read_line_geoms(line_fc, backend)
+    point_oids, points_xy = read_point_xy(point_fc, backend=backend)
+    corridor = build_corridor(list(route_geoms.values()), radius, cap_style="flat", cache_dir=cache_dir)
+
+    oids, near, measures = station_routes(route_geoms, point_oids, points_xy, corridor, radius, max_workers,
+                                          backend.spatial_reference(line_fc), cache_dir)
+    stationing = write_station_results(point_fc, oids, near, measures, format_station, backend=backend)
+    backend.message(f"Stationed {len(stationing)} handholes across {len(route_geoms)} route(s) "
+                    f"with {max_workers or os.cpu_count()} worker(s).")
+    return stationing
+
+def write_station_results(point_fc, oids, near, measures, format_station, clear_unstationed=False, backend=None):
+    """
+    Write the Near fields, STATIONING and STATION_FT of the handholes in oids back to point_fc in one
+    cursor pass. Only those rows are touched. With clear_unstationed, both station fields are set to null
+    where the measure is NaN instead of keeping the old value (used when a moved handhole is no longer
+    on the route).
+    Returns a dict of handhole OID -> STATIONING for the handholes that were stationed.
+    """
+    backend = backend or default_backend()
+    row_of = {oid: i for i, oid in enumerate(np.asarray(oids).tolist())}
+    station_ft = {oid: m for oid, m in zip(row_of, np.asarray(measures).tolist()) if not np.isnan(m)}
+    stationing = {oid: format_station(m) for oid, m in station_ft.items()}
+
+    existing = set(backend.list_fields(point_fc))
+    for name, field_type in NEAR_FIELDS:
+        if name not in existing:
+            backend.add_field(point_fc, name, field_type)
+    add_station_fields(point_fc, backend)
+
+    near_names = [name for name, _ in NEAR_FIELDS]
+    near_values = {name: near[name].tolist() for name in near_names}
+    with backend.update_cursor(point_fc, ["OID@"] + near_names + ["STATIONING", STATION_FIELD]) as cursor:
+        for row in cursor:
+            i = row_of.get(row[0])
+            if i is None:
+                continue
+            row[1:-2] = [near_values[name][i] for name in near_names]
+            if row[0] in stationing:
+                row[-2:] = [stationing[row[0]], station_ft[row[0]]]
+            elif clear_unstationed:
+                row[-2:] = [None, None]
+            cursor.updateRow(row)
+    return stationing
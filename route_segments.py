@@ -0,0 +1,172 @@
+import os
+
+import numpy as np
+import shapely
+
+from backends import default_backend
+from chainage import points_at_measures, segment_geometry
+from station_fields import STATION_FIELD, add_station_fields
+
+class VirtualRouteSegments:
+    """
+    RouteSegments kept as shared prefixes: every segment runs from the start of a centerline to an
+    end measure, so instead of N polylines (which repeat the first vertices N times) only the
+    centerline chainage tables and one measure per segment are stored.
+
+    Segment i (in Line_Points order, OID i + 1) has LINE_OID, MEASURE (also as STATION_FT), STATIONING and SEGMENT_ID,
+    where SEGMENT_ID numbers the segments by increasing length like the sorted RouteSegments did,
+    plus the ConnectionNum of its snapped point when one is given.
+    Geometries are built only when SHAPE@ is read or the segments are exported, and STATIONING
+    strings (format_station of the measure) only when they are read, so memory stays at a few
+    numbers per segment.
+    """
+
+    def __init__(self, chainages, line_oids, measures, format_station, spatial_ref=None, connection_nums=None):
+        line_oids = np.asarray(line_oids, dtype=np.int64)
+        keep = line_oids != -1  # Points that are not on any centerline get no segment.
+        self.chainages = chainages
+        self.line_oids = line_oids[keep]
+        self.measures = np.asarray(measures, dtype=np.float64)[keep]
+        self.format_station = format_station
+        self.connection_nums = None
+        if connection_nums is not None:
+            self.connection_nums = [num for num, k in zip(connection_nums, keep.tolist()) if k]
+        self.spatial_ref = spatial_ref
+        # A prefix's length is its end measure, so sorting by measure is sorting by Shape_Length.
+        self.segment_ids = np.empty(len(self.measures), dtype=np.int64)
+        self.segment_ids[np.argsort(self.measures, kind="stable")] = np.arange(1, len(self.measures) + 1)
+
+    def __len__(self):
+        return len(self.measures)
+
+    def geometry(self, i):
+        # Shapely polyline of segment i, built on demand from the shared centerline.
+        return segment_geometry(self.chainages[int(self.line_oids[i])], self.measures[i])
+
+    def station(self, i):
+        # STATIONING text of segment i, formatted from its end measure.
+        return self.format_station(float(self.measures[i]))
+
+    def end_points(self):
+        # (N, 2) end vertex of every segment, straight from the measures without building the prefixes.
+        xy = np.empty((len(self), 2))
+        for line_oid in np.unique(self.line_oids).tolist():
+            mask = self.line_oids == line_oid
+            xy[mask] = points_at_measures(self.chainages[line_oid], self.measures[mask])
+        return xy
+
+    def end_point_table(self):
+        # EndPoints as in-memory columns (see end_point_table()), straight from the measures.
+        table = {
+            "OID": np.arange(1, len(self) + 1),
+            "SEGMENT_ID": self.segment_ids.copy(),
+            STATION_FIELD: self.measures.copy(),
+            "XY": self.end_points(),
+        }
+        if self.connection_nums is not None:
+            table["ConnectionNum"] = list(self.connection_nums)
+        return table
+
+    def _value(self, i, field):
+        token = field.upper()
+        if token == "OID@":
+            return i + 1
+        if token == "SHAPE@":
+            return self.geometry(i)
+        if token == "SHAPE@LENGTH":
+            return float(self.measures[i])
+        if token == "SEGMENT_ID":
+            return int(self.segment_ids[i])
+        if token == "STATIONING":
+            return self.station(i)
+        if token in ("MEASURE", STATION_FIELD):
+            return float(self.measures[i])
+        if token == "LINE_OID":
+            return int(self.line_oids[i])
+        if token == "CONNECTIONNUM" and self.connection_nums is not None:
+            return self.connection_nums[i]
+        raise KeyError(f"VirtualRouteSegments has no field {field}")
+
+    def search_cursor(self, fields):
+        # Read-only cursor with the same row layout as a search cursor on the RouteSegments feature class.
+        return _VirtualCursor(self, fields)
+
+    def export(self, workspace, name="RouteSegments", backend=None):
+        """
+        Write the segments out as a real polyline feature class (STATIONING, STATION_FT, SEGMENT_ID
+        and ConnectionNum if known), e.g. for a geoprocessing tool that needs one. Returns its path.
+        """
+        backend = backend or default_backend()
+        path = os.path.join(workspace, name)
+        if backend.exists(path):
+            backend.delete(path)
+        backend.create_feature_class(workspace, name, "POLYLINE", self.spatial_ref)
+        add_station_fields(path, backend)
+        backend.add_field(path, "SEGMENT_ID", "LONG")
+        fields = ["SHAPE@", "STATIONING", STATION_FIELD, "SEGMENT_ID"]
+        if self.connection_nums is not None:
+            backend.add_field(path, "ConnectionNum", "LONG")
+            fields.append("ConnectionNum")
+        with backend.insert_cursor(path, fields) as cursor:
+            for row in self.search_cursor(fields):
+                cursor.insertRow(list(row))
+        return path
+
+class _VirtualCursor:
+
+    def __init__(self, segments, fields):
+        self._segments = segments
+        self._fields = fields
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __iter__(self):
+        for i in range(len(self._segments)):
+            yield tuple(self._segments._value(i, field) for field in self._fields)
+
+def segment_cursor(route_segments, fields, backend=None):
+    # Search cursor over RouteSegments, whether it is a feature class path or VirtualRouteSegments.
+    if isinstance(route_segments, VirtualRouteSegments):
+        return route_segments.search_cursor(fields)
+    return (backend or default_backend()).search_cursor(route_segments, fields)
+
+def end_point_table(route_segments, backend=None):
+    """
+    The last vertex of every route segment with its attributes, as a dict of columns:
+        OID        - RouteSegments OID
+        SEGMENT_ID - segment number by increasing length
+        STATION_FT - station of the segment's end in feet
+        XY         - (N, 2) array of end vertex coordinates
+    plus ConnectionNum (the handhole the segment ends at) when the segments carry it.
+    For VirtualRouteSegments this is computed from the end measures without building any geometry;
+    for a RouteSegments feature class the polylines are read once (STATION_FT falls back to the
+    segment length on feature classes written before that field existed).
+    """
+    if isinstance(route_segments, VirtualRouteSegments):
+        return route_segments.end_point_table()
+    backend = backend or default_backend()
+    # STATION_FT and ConnectionNum are read when the feature class has them.
+    optional = [name for name in (STATION_FIELD, "ConnectionNum") if name in backend.list_fields(route_segments)]
+    oids, seg_ids, station_ft, xy, connection_nums = [], [], [], [], []
+    with backend.search_cursor(route_segments, ["OID@", "SHAPE@", "SEGMENT_ID"] + optional) as cursor:
+        for oid, polyline, seg_id, *extra in cursor:
+            if polyline is not None and not polyline.is_empty:
+                values = dict(zip(optional, extra))
+                oids.append(oid)
+                seg_ids.append(seg_id)
+                station_ft.append(values[STATION_FIELD] if STATION_FIELD in values else polyline.length)
+                xy.append(shapely.get_coordinates(polyline)[-1])
+                connection_nums.append(values.get("ConnectionNum"))
+    table = {
+        "OID": np.asarray(oids, dtype=np.int64),
+        "SEGMENT_ID": np.asarray(seg_ids, dtype=np.int64),
+        STATION_FIELD: np.asarray(station_ft, dtype=np.float64),
+        "XY": np.asarray(xy, dtype=np.float64).reshape(-1, 2),
+    }
+    if "ConnectionNum" in optional:
+        table["ConnectionNum"] = connection_nums
+    return table
@@ -0,0 +1,81 @@
+import os, shutil, tempfile
+from contextlib import contextmanager
+
+class ScratchWorkspace:
+    """
+    Workspace for the intermediate datasets of one run (Line_Points, Connection_Lines, EndPoints,
+    spatial join outputs, ...), so they are never written to the production GDB.
+
+        with ScratchWorkspace(backend) as scratch:
+            line_points_fc = scratch.path("Line_Points")
+            ...
+
+    kind="memory" uses ArcGIS Pro's "memory" workspace; kind="gpkg" uses a throwaway GeoPackage
+    in a new temp folder. By default the arcpy backend gets "memory" and every other backend "gpkg".
+    Every dataset named through path() is tracked and deleted when the block exits, whether it
+    finished or raised; the temp folder of a GeoPackage scratch is removed with it.
+    """
+
+    def __init__(self, backend, kind=None):
+        self.backend = backend
+        self.kind = kind or ("memory" if backend.name == "arcpy" else "gpkg")
+        self.workspace = None
+        self.created = []
+        self._folder = None
+
+    def __enter__(self):
+        if self.kind == "memory":
+            self.workspace = "memory"
+        elif self.kind == "gpkg":
+            self._folder = tempfile.mkdtemp(prefix="stationizer_scratch_")
+            self.workspace = os.path.join(self._folder, "scratch.gpkg")
+        else:
+            raise ValueError(f"Unknown scratch workspace kind: {self.kind}")
+        return self
+
+    def __exit__(self, *exc):
+        self.cleanup()
+        return False
+
+    def path(self, name):
+        # Full path of a scratch dataset; it is deleted on cleanup.
+        path = os.path.join(self.workspace, name)
+        if path not in self.created:
+            self.created.append(path)
+        return path
+
+    def cleanup(self):
+        """
+        Delete every tracked dataset (newest first) and the temp folder. Safe to call more than once.
+        A dataset that cannot be deleted is reported and skipped, so cleanup never hides the error
+        that ended the run.
+        """
+        while self.created:
+            path = self.created.pop()
+            try:
+                if self.backend.exists(path):
+                    self.backend.delete(path)
+            except Exception as e:
+                self.backend.message(f"Could not delete scratch dataset {path}: {e}")
+        if self._folder:
+            shutil.rmtree(self._folder, ignore_errors=True)
+            self._folder = None
+
+@contextmanager
+def atomic_write(path, mode="w"):
+    """
+    Open a temp file next to path and move it over path when the block finishes, so an interrupted
+    run or a parallel worker never leaves a truncated file behind. If the block raises, the temp
+    file is removed and path is left as it was.
+
+        with atomic_write(state_path) as f:
+            json.dump(state, f)
+    """
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, mode) as f:
+            yield f
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
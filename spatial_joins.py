@@ -0,0 +1,65 @@
+import numpy as np
+from shapely import STRtree
+
+def nearest_within(tree, query_xy, radius):
+    """
+    Index of the nearest tree point within radius for every query point, -1 where there is none.
+    One bulk KD-tree query for all points.
+    """
+    query_xy = np.asarray(query_xy, dtype=np.float64).reshape(-1, 2)
+    if len(query_xy) == 0 or tree.n == 0:
+        return np.full(len(query_xy), -1, dtype=np.int64)
+    # distance_upper_bound is exclusive, so nudge it to keep points exactly at the radius.
+    _, idx = tree.query(query_xy, k=1, distance_upper_bound=np.nextafter(radius, np.inf))
+    return np.where(idx == tree.n, -1, idx).astype(np.int64)
+
+# Size of each linear unit in meters, keyed by the lower-case name with spaces and underscores dropped.
+# Covers the ArcGIS linear unit keywords ("Feet", "Meters", ...) and spatial reference
+# linearUnitName values ("Foot", "Foot_US", "Meter", ...).
+METERS_PER_UNIT = {
+    "feet": 0.3048, "foot": 0.3048, "internationalfeet": 0.3048,
+    "footus": 1200.0 / 3937.0, "feetus": 1200.0 / 3937.0, "ussurveyfeet": 1200.0 / 3937.0,
+    "inches": 0.0254, "inch": 0.0254,
+    "yards": 0.9144, "yard": 0.9144,
+    "miles": 1609.344, "mile": 1609.344,
+    "nauticalmiles": 1852.0, "nauticalmile": 1852.0,
+    "meters": 1.0, "meter": 1.0, "metres": 1.0, "metre": 1.0,
+    "centimeters": 0.01, "centimeter": 0.01,
+    "millimeters": 0.001, "millimeter": 0.001,
+    "kilometers": 1000.0, "kilometer": 1000.0,
+}
+
+def _meters_per_unit(unit):
+    key = str(unit).lower().replace(" ", "").replace("_", "")
+    if key not in METERS_PER_UNIT:
+        raise ValueError(f"Unknown linear unit: {unit!r}")
+    return METERS_PER_UNIT[key]
+
+def linear_distance(value, units="Feet"):
+    """
+    A linear distance such as "10 Feet" or "3 Meters" converted to units, the dataset's linear
+    unit (feet for these GDBs; pass spatialReference.linearUnitName for anything else).
+    A plain number, or a string with no unit, is taken to be in units already.
+    Raises ValueError for a unit that is not a known linear unit (e.g. "DecimalDegrees").
+    """
+    if isinstance(value, (int, float)):
+        return float(value)
+    number, _, unit = str(value).strip().partition(" ")
+    if not unit.strip():
+        return float(number)
+    return float(number) * _meters_per_unit(unit) / _meters_per_unit(units)
+
+def last_intersecting_values(source_geoms, source_values, target_geoms):
+    """
+    For every target geometry intersected by at least one source geometry, the value of the
+    last intersecting source in source order ("last writer wins", as when the sources are applied
+    one after another). Uses an STRtree over the targets and one bulk intersects query.
+    Returns a dict of target index -> value.
+    """
+    if len(source_geoms) == 0 or len(target_geoms) == 0:
+        return {}
+    tree = STRtree(target_geoms)
+    source_idx, target_idx = tree.query(source_geoms, predicate="intersects")
+    winner = np.full(len(target_geoms), -1, dtype=np.int64)
+    np.maximum.at(winner, target_idx, source_idx)
+    return {int(t): source_values[s] for t, s in enumerate(winner.tolist()) if s != -1}
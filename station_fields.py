@@ -0,0 +1,20 @@
+from backends import default_backend
+
+# STATIONING holds the "XX+YY" text from format_station() and is for display only: compared as text
+# it sorts 100+00 before 99+99. Every stationed output also carries the station in feet as a double,
+# with an attribute index, and sorting and range queries use that field.
+STATION_FIELD = "STATION_FT"
+STATION_INDEX = "STATION_FT_IDX"
+
+def add_station_fields(fc, backend=None, text_length=20):
+    """
+    Add STATIONING (text) and STATION_FT (double) to fc where missing, and the attribute index on
+    STATION_FT. Safe to call on a feature class that already has them.
+    """
+    backend = backend or default_backend()
+    existing = set(backend.list_fields(fc))
+    if "STATIONING" not in existing:
+        backend.add_field(fc, "STATIONING", "TEXT", field_length=text_length)
+    if STATION_FIELD not in existing:
+        backend.add_field(fc, STATION_FIELD, "DOUBLE")
+    backend.add_index(fc, [STATION_FIELD], STATION_INDEX)
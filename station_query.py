@@ -0,0 +1,187 @@
+import argparse, os
+
+import numpy as np
+
+from backends import default_backend, get_backend
+from station_fields import STATION_FIELD
+
+def parse_station(station):
+    """
+    Station in feet from a number or a "XX+YY" station string, e.g. "12+00" -> 1200.0.
+    Stations past 99+99 simply have more digits before the "+" ("125+50" -> 12550.0).
+    """
+    if isinstance(station, str):
+        hundreds, _, remainder = station.strip().partition("+")
+        return float(hundreds or 0) * 100 + float(remainder or 0)
+    return float(station)
+
+def _parse_stations(stations):
+    # Array of stations in feet from a scalar or a sequence of numbers / station strings.
+    if isinstance(stations, np.ndarray) and stations.dtype.kind in "fiu":
+        return stations.astype(np.float64)
+    return np.array([parse_station(s) for s in np.atleast_1d(np.asarray(stations, dtype=object))], dtype=np.float64)
+
+class StationIndex:
+    """
+    In-memory index over one stationed route: the station (in feet) of every handhole sorted once,
+    with the handhole OIDs alongside. Every query is a binary search (np.searchsorted) on that array:
+
+        index = StationIndex.from_feature_class(point_fc)
+        index.range("12+00", "25+50")  # handholes between two stations
+        index.nearest("40+00", k=3)    # the 3 handholes closest to a station
+        index.next_after(1200)         # the next handhole down the route
+        index.previous_before(1200)    # the previous handhole up the route
+
+    Queries take feet or "XX+YY" strings and return OIDs (in station order, nearest first for
+    nearest). Each has a batch form
+    (range_batch, nearest_batch, next_after_batch, previous_before_batch) that answers many
+    queries in one vectorized call.
+    """
+
+    def __init__(self, oids, stations):
+        oids = np.asarray(oids, dtype=np.int64)
+        stations = np.asarray(stations, dtype=np.float64)
+        keep = ~np.isnan(stations)  # Unstationed handholes are not indexed.
+        oids, stations = oids[keep], stations[keep]
+        # Sort by station, ties by OID, so results are deterministic.
+        order = np.lexsort((oids, stations))
+        self.oids = oids[order]
+        self.stations = stations[order]
+
+    @classmethod
+    def from_feature_class(cls, fc, where_clause=None, backend=None):
+        # Index the STATION_FT values of a stationed feature class (rows without a station are skipped).
+        backend = backend or default_backend()
+        oids, stations = [], []
+        with backend.search_cursor(fc, ["OID@", STATION_FIELD], where_clause) as cursor:
+            for oid, station_ft in cursor:
+                if station_ft is not None:
+                    oids.append(oid)
+                    stations.append(station_ft)
+        return cls(oids, stations)
+
+    @classmethod
+    def by_route(cls, oids, stations, line_oids):
+        """
+        One StationIndex per centerline, e.g. from a station_measures() table:
+            StationIndex.by_route(table["OID"], table["MEASURE"], table["LINE_OID"])
+        Returns a dict of line OID -> StationIndex (points on no centerline, line OID -1, are skipped).
+        """
+        oids = np.asarray(oids, dtype=np.int64)
+        stations = np.asarray(stations, dtype=np.float64)
+        line_oids = np.asarray(line_oids, dtype=np.int64)
+        return {line_oid: cls(oids[line_oids == line_oid], stations[line_oids == line_oid])
+                for line_oid in np.unique(line_oids).tolist() if line_oid != -1}
+
+    def __len__(self):
+        return len(self.oids)
+
+    def range(self, start, end):
+        # OIDs with start <= station <= end, in station order.
+        lo, hi = self._range_bounds(start, end)
+        return self.oids[lo[0]:hi[0]]
+
+    def range_batch(self, starts, ends):
+        # range() for many (start, end) pairs; returns a list of OID arrays.
+        lo, hi = self._range_bounds(starts, ends)
+        return [self.oids[i:j] for i, j in zip(lo.tolist(), hi.tolist())]
+
+    def range_counts(self, starts, ends):
+        # Number of handholes in each [start, end] range, without building the OID lists.
+        lo, hi = self._range_bounds(starts, ends)
+        return hi - lo
+
+    def _range_bounds(self, starts, ends):
+        lo = np.searchsorted(self.stations, _parse_stations(starts), side="left")
+        hi = np.searchsorted(self.stations, _parse_stations(ends), side="right")
+        return lo, np.maximum(hi, lo)
+
+    def nearest(self, station, k=1):
+        # The k OIDs closest to station along the route, nearest first.
+        return self.nearest_batch([station], k)[0]
+
+    def nearest_batch(self, stations, k=1):
+        """
+        nearest() for many stations at once. Returns an (M, k) array of OIDs, nearest first
+        (k is capped at the number of indexed handholes). Equal distances go to the lower station.
+        """
+        queries = _parse_stations(stations)
+        k = min(k, len(self))
+        if k == 0:
+            return np.empty((len(queries), 0), dtype=np.int64)
+        # The k nearest always lie within k positions either side of the insertion point.
+        pos = np.searchsorted(self.stations, queries)
+        window = np.clip(pos[:, None] + np.arange(-k, k)[None, :], 0, len(self) - 1)
+        distance = np.abs(self.stations[window] - queries[:, None])
+        # Clipping repeats the first/last position; push the repeats to the back of the ordering.
+        repeated = np.zeros(window.shape, dtype=bool)
+        repeated[:, 1:] = window[:, 1:] == window[:, :-1]
+        distance[repeated] = np.inf
+        best = np.take_along_axis(window, np.argsort(distance, axis=1, kind="stable")[:, :k], axis=1)
+        return self.oids[best]
+
+    def next_after(self, station):
+        # OID of the first handhole strictly past station, or None at the end of the route.
+        oid = self.next_after_batch([station])[0]
+        return None if oid == -1 else int(oid)
+
+    def next_after_batch(self, stations):
+        # next_after() for many stations; -1 where there is no next handhole.
+        pos = np.searchsorted(self.stations, _parse_stations(stations), side="right")
+        return self._oids_at(pos, pos < len(self))
+
+    def previous_before(self, station):
+        # OID of the last handhole strictly before station, or None at the start of the route.
+        oid = self.previous_before_batch([station])[0]
+        return None if oid == -1 else int(oid)
+
+    def previous_before_batch(self, stations):
+        # previous_before() for many stations; -1 where there is no previous handhole.
+        pos = np.searchsorted(self.stations, _parse_stations(stations), side="left") - 1
+        return self._oids_at(pos, pos >= 0)
+
+    def _oids_at(self, pos, valid):
+        oids = np.full(len(pos), -1, dtype=np.int64)
+        oids[valid] = self.oids[pos[valid]]
+        return oids
+
+    def station_of(self, oids):
+        # STATION_FT of the given OIDs (NaN for OIDs that are not indexed).
+        oids = np.atleast_1d(np.asarray(oids, dtype=np.int64))
+        stations = np.full(len(oids), np.nan)
+        if len(self):
+            by_oid = np.argsort(self.oids, kind="stable")
+            pos = by_oid[np.minimum(np.searchsorted(self.oids, oids, sorter=by_oid), len(self) - 1)]
+            found = self.oids[pos] == oids
+            stations[found] = self.stations[pos[found]]
+        return stations
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the handholes of a stationed route by station.")
+    parser.add_argument("workspace", help="File geodatabase or GeoPackage with the stationed handholes.")
+    parser.add_argument("--points", default="Handholes", help="Stationed point feature class.")
+    parser.add_argument("--where", help="Where clause selecting one route's handholes when the layer holds several.")
+    parser.add_argument("--range", nargs=2, metavar=("START", "END"), help='Handholes between two stations, e.g. 12+00 25+50.')
+    parser.add_argument("--nearest", metavar="STATION", help="Handholes closest to a station.")
+    parser.add_argument("-k", type=int, default=1, help="Number of handholes returned by --nearest.")
+    parser.add_argument("--next", metavar="STATION", help="Next handhole after a station.")
+    parser.add_argument("--previous", metavar="STATION", help="Previous handhole before a station.")
+    args = parser.parse_args()
+
+    index = StationIndex.from_feature_class(os.path.join(args.workspace, args.points), args.where,
+                                            get_backend(workspace=args.workspace))
+    show = lambda oids: ", ".join(f"{oid} ({station:.1f} ft)" for oid, station in
+                                  zip(np.atleast_1d(oids).tolist(), index.station_of(oids).tolist())) or "none"
+    if args.range:
+        print(f"Between {args.range[0]} and {args.range[1]}: {show(index.range(*args.range))}")
+    if args.nearest:
+        print(f"Nearest to {args.nearest}: {show(index.nearest(args.nearest, args.k))}")
+    if args.next:
+        oid = index.next_after(args.next)
+        print(f"Next after {args.next}: {show([] if oid is None else [oid])}")
+    if args.previous:
+        oid = index.previous_before(args.previous)
+        print(f"Previous before {args.previous}: {show([] if oid is None else [oid])}")
+
+if __name__ == "__main__":
+    main()